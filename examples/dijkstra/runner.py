@@ -1,23 +1,23 @@
 
 import cProfile, importlib
-import sys, gzip
+import sys
+import json
 import time, random
 from priorityq import PQ
 import priorityq.storage
-from priorityq.algorithms.dijkstra import shortest_path
+from priorityq.storage import stats
+from priorityq.algorithms.dijkstra import shortest_path, shortest_path_csr, bidirectional_shortest_path
+from priorityq.algorithms import astar
+from priorityq.algorithms import dimacs
+from priorityq.algorithms.batch import shortest_paths
 from collections import defaultdict
 INFINITY = sys.maxint
 
-def lines_from(path):
-    if path.lower().endswith(".gz"):
-        infile = gzip.GzipFile(path)
-    else:
-        infile = open(path)
-
-    lines = infile.read().split("\n")
-    for line in lines:
-        l = [l.strip() for l in line.split(" ") if l.strip()]
-        if not l or l[0] not in ["a", "p"]:
+def lines_from(path, kinds = ("a", "p")):
+    infile = dimacs.open_file(path)
+    for line in infile:
+        l = line.split()
+        if not l or l[0] not in kinds:
             continue
         yield l
     infile.close()
@@ -46,6 +46,17 @@ def read_graph(graph_path):
     assert numedges == edgecount
     return nodes, edges, numnodes, numedges
 
+def read_coordinates(coords_path):
+    # The coordinate file contains entries of the following format:
+    # c <comment>
+    # p aux sp co numnodes
+    # v node longitude latitude
+    # where the longitude and latitude are in millionths of a degree.
+    coordinates = {}
+    for l in lines_from(coords_path, ("v",)):
+        coordinates[int(l[1])] = (int(l[2]) / 1000000.0, int(l[3]) / 1000000.0)
+    return coordinates
+
 def random_nodes(numnodes):
     source = int(random.random() * numnodes)
     dest = int(random.random() * numnodes)
@@ -66,6 +77,117 @@ def profile_shortest_path(nodes, edges, source, dest, heapmodule):
     print "HeapModule: %s, SP (%d -> %d), Distance = %d, Nodes Processed: %d, Time Taken: %f seconds, %f nodes/seconds" % (heapmodule.__name__, source, dest, dist, numfinds, timetaken, numfinds / float(timetaken))
     return numfinds, timetaken
 
+def profile_shortest_path_csr(graph, source, dest):
+    starttime = time.time()
+    distances, parents = shortest_path_csr(source, dest, graph)
+    dist = distances[dest]
+    endtime = time.time()
+    numfinds = sum(1 for p in parents if p >= 0)
+    timetaken = endtime - starttime
+    print "CSR, SP (%d -> %d), Distance = %d, Nodes Processed: %d, Time Taken: %f seconds, %f nodes/seconds" % (source, dest, dist, numfinds, timetaken, numfinds / float(timetaken))
+    return numfinds, timetaken
+
+def run_csr_tests(graph_path, numtries):
+    # DIMACS nodes are numbered from 1 so the graph has an extra node 0
+    graph = dimacs.load_graph(graph_path)
+    numnodes = graph.numnodes - 1
+    test_nodes = [random_nodes(numnodes) for i in range(numtries)]
+    totalnodes, totaltime = 0, 0
+    for source,dest in test_nodes:
+        nodes_processed, timetaken = profile_shortest_path_csr(graph, source, dest)
+        totalnodes += nodes_processed
+        totaltime += timetaken
+    print "CSR, Total Nodes: %d, Total Time: %f seconds, Nodes per second: %f seconds" % (totalnodes, totaltime, totalnodes / float(totaltime))
+
+def run_parallel_tests(graph_path, numtries, processes = None):
+    # DIMACS nodes are numbered from 1 so the graph has an extra node 0
+    graph = dimacs.load_graph(graph_path)
+    numnodes = graph.numnodes - 1
+    test_nodes = [random_nodes(numnodes) for i in range(numtries)]
+    totaltime = 0
+    starttime = time.time()
+    for source,dest,dist,path,timetaken in shortest_paths(test_nodes, graph, processes):
+        totaltime += timetaken
+        print "Parallel, SP (%d -> %d), Distance = %d, Path Length: %d, Time Taken: %f seconds" % (source, dest, dist, len(path), timetaken)
+    walltime = time.time() - starttime
+    print "Parallel, Queries: %d, Total Query Time: %f seconds, Wall Time: %f seconds" % (numtries, totaltime, walltime)
+
+def reverse_graph(edges):
+    reverse_edges = defaultdict(dict)
+    for src in edges:
+        for dest,dist in edges[src].iteritems():
+            reverse_edges[dest][src] = dist
+    return reverse_edges
+
+def run_bidirectional_tests(graph_path, numtries):
+    nodes, edges, numnodes, numedges = read_graph(graph_path)
+    reverse_edges = reverse_graph(edges)
+    test_nodes = [random_nodes(numnodes) for i in range(numtries)]
+
+    # Each settled node has its neighbours visited exactly once
+    settled = [0]
+    def counted(graph):
+        def neighbour_func(node):
+            settled[0] += 1
+            return graph.get(node, {}).iteritems()
+        return neighbour_func
+
+    totals = {"unidirectional": [0, 0], "bidirectional": [0, 0]}
+    for source,dest in test_nodes:
+        for name in ["unidirectional", "bidirectional"]:
+            settled[0] = 0
+            starttime = time.time()
+            if name == "unidirectional":
+                distances, parents = shortest_path(source, dest, counted(edges))
+                dist = distances[dest]
+            else:
+                dist, path = bidirectional_shortest_path(source, dest, counted(edges), counted(reverse_edges))
+            timetaken = time.time() - starttime
+            totals[name][0] += settled[0]
+            totals[name][1] += timetaken
+            print "%s, SP (%d -> %d), Distance = %d, Nodes Settled: %d, Time Taken: %f seconds" % (name, source, dest, dist, settled[0], timetaken)
+    for name in ["unidirectional", "bidirectional"]:
+        print "%s, Total Nodes Settled: %d, Total Time: %f seconds" % (name, totals[name][0], totals[name][1])
+
+def run_astar_tests(graph_path, coords_path, numtries, scale = 1):
+    nodes, edges, numnodes, numedges = read_graph(graph_path)
+    heuristic = astar.great_circle_heuristic(read_coordinates(coords_path), scale)
+    test_nodes = [random_nodes(numnodes) for i in range(numtries)]
+    def neighbour_func(node):
+        return edges.get(node, {}).iteritems()
+
+    totals = {"dijkstra": [0, 0], "astar": [0, 0]}
+    for source,dest in test_nodes:
+        for name in ["dijkstra", "astar"]:
+            starttime = time.time()
+            if name == "dijkstra":
+                distances, parents = shortest_path(source, dest, neighbour_func)
+            else:
+                distances, parents = astar.shortest_path(source, dest, neighbour_func, heuristic)
+            timetaken = time.time() - starttime
+            totals[name][0] += len(parents)
+            totals[name][1] += timetaken
+            print "%s, SP (%d -> %d), Distance = %d, Nodes Processed: %d, Time Taken: %f seconds" % (name, source, dest, distances[dest], len(parents), timetaken)
+    for name in ["dijkstra", "astar"]:
+        print "%s, Total Nodes: %d, Total Time: %f seconds" % (name, totals[name][0], totals[name][1])
+
+def run_stats_tests(graph_path, numtries, heapmodule):
+    nodes, edges, numnodes, numedges = read_graph(graph_path)
+    test_nodes = [random_nodes(numnodes) for i in range(numtries)]
+    def neighbour_func(node):
+        return edges.get(node, {}).iteritems()
+
+    # Every storage created by shortest_path records into the same collector
+    collector = stats.Stats()
+    def storage_class():
+        storage = heapmodule.Storage()
+        stats.instrument(storage, collector)
+        return storage
+
+    for source,dest in test_nodes:
+        shortest_path(source, dest, neighbour_func, storage_class)
+    print json.dumps(collector.as_dict(), indent = 2, sort_keys = True)
+
 def profile_all_shortest_paths(nodes, edges, numnodes, numedges, heapmodules, test_nodes):
     # The graph file contains entry of the following format:
     # c <comment>
@@ -88,8 +210,26 @@ def run_tests(graph_path, numtries, heapmodule = None):
     else:
         from priorityq.storage import binheap
         from priorityq.storage import listheap
+        from priorityq.storage import arrayheap
+        from priorityq.storage import pairingheap
+        from priorityq.storage import binomialheap
+        from priorityq.storage import fibheap
+        from priorityq.storage import daryheap
+        from priorityq.storage import radixheap
+        from priorityq.storage import compactheap
+        from priorityq.storage import timerwheel
+        from priorityq.storage import external
         heapmodules = [
             binheap,
+            arrayheap,
+            pairingheap,
+            binomialheap,
+            fibheap,
+            daryheap,
+            radixheap,
+            compactheap,
+            timerwheel,
+            external,
             listheap
         ]
     nodes, edges, numnodes, numedges = read_graph(graph_path)
@@ -100,6 +240,22 @@ if __name__ == "__main__":
     graph_path = sys.argv[1]
     numtries = int(sys.argv[2])
     heapmodule = None
-    if len(sys.argv) > 3:
-        heapmodule = importlib.import_module("priorityq.storage." + sys.argv[3])
-    run_tests(graph_path, numtries, heapmodule)
+    if len(sys.argv) > 3 and sys.argv[3] == "csr":
+        run_csr_tests(graph_path, numtries)
+    elif len(sys.argv) > 3 and sys.argv[3] == "bidirectional":
+        run_bidirectional_tests(graph_path, numtries)
+    elif len(sys.argv) > 3 and sys.argv[3] == "parallel":
+        # runner.py <graph> <numtries> parallel [<processes>]
+        processes = int(sys.argv[4]) if len(sys.argv) > 4 else None
+        run_parallel_tests(graph_path, numtries, processes)
+    elif len(sys.argv) > 4 and sys.argv[3] == "stats":
+        # runner.py <graph> <numtries> stats <heapmodule>
+        run_stats_tests(graph_path, numtries, importlib.import_module("priorityq.storage." + sys.argv[4]))
+    elif len(sys.argv) > 4 and sys.argv[3] == "astar":
+        # runner.py <graph> <numtries> astar <coordinates> [<units per meter>]
+        scale = float(sys.argv[5]) if len(sys.argv) > 5 else 1
+        run_astar_tests(graph_path, sys.argv[4], numtries, scale)
+    else:
+        if len(sys.argv) > 3:
+            heapmodule = importlib.import_module("priorityq.storage." + sys.argv[3])
+        run_tests(graph_path, numtries, heapmodule)
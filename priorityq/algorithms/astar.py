@@ -0,0 +1,108 @@
+import math
+from priorityq import PQ
+from priorityq.storage import binheap
+from priorityq.algorithms.dijkstra import INFINITY
+from collections import defaultdict
+
+# Polar radius of the earth in meters.  Using the smallest radius keeps great circle
+# distances at or below the distance along the surface.
+EARTH_RADIUS = 6356752.0
+
+def shortest_path(source, target, neighbour_func, heuristic, storage_class = None):
+    """Return the shortest path from the source to target using A* search.
+
+    Nodes are popped in the order of their distance from the source plus the estimated
+    distance to the target so the search is pulled towards the target and settles far
+    fewer nodes than dijkstra.shortest_path.  The path found is the shortest as long as
+    the heuristic never overestimates the distance to the target.  A node that is reached
+    by a shorter path after it has been popped is pushed again, so a heuristic that is
+    admissible but not consistent still gives the shortest path.
+
+    **Parameters**
+        source          -   The source node from which the path is to be calculated
+        target          -   The target node to which the path is to be calculated
+        neighbour_func  -   A function that when given a node, returns an iterator of tuples where each tuple is an edge to another node along with the weight of the edge.
+        heuristic       -   A function that when given a node and the target returns an estimate of the distance between them.
+
+    **Keyword Arguments**
+        storage_class   -   The Storage class that is to be used for the priority queue
+                            which stores the nodes prioritized by their estimated distance.
+                            Default: prioirityq.storage.binheap.Storage
+
+    **Returns**
+        A tuple that contains a map of distances for each node from the source along with a map of each node to its parent.
+    """
+    storage_class = storage_class or binheap.Storage
+
+    distances = {source: 0}
+    distances.setdefault(target, INFINITY)
+    parents = defaultdict(lambda: None)
+
+    # The heuristic is only evaluated once per node as a node's key is recomputed
+    # every time its distance decreases.
+    estimates = {}
+    def estimated_distance(node):
+        estimate = estimates.get(node)
+        if estimate is None:
+            estimate = estimates[node] = heuristic(node, target)
+        return distances[node] + estimate
+
+    nodeheap = PQ([source], store = storage_class(), key = estimated_distance)
+    while nodeheap:
+        currnode = nodeheap.pop()
+        if currnode == target: break
+
+        curr_dist = distances[currnode]
+        for child,child_dist in neighbour_func(currnode):
+            child_dist += curr_dist
+            if child not in distances or child_dist < distances[child]:
+                distances[child] = child_dist
+                parents[child] = currnode
+
+                # Pushes the child if it is not in the heap
+                nodeheap.adjust(child)
+    return distances, parents
+
+def euclidean_heuristic(coordinates, scale = 1):
+    """Returns a heuristic for the straight line distance between nodes on a plane.
+
+    **Parameters**
+        coordinates     -   A map of each node to its (x, y) coordinates.
+
+    **Keyword Arguments**
+        scale           -   Multiplier to convert distances between coordinates to the units of
+                            the edge weights.  Default: 1
+    """
+    def heuristic(node, target):
+        x1, y1 = coordinates[node]
+        x2, y2 = coordinates[target]
+        return scale * math.hypot(x2 - x1, y2 - y1)
+    return heuristic
+
+def great_circle_heuristic(coordinates, scale = 1, radius = EARTH_RADIUS):
+    """Returns a heuristic for the great circle distance between nodes on the earth.
+
+    **Parameters**
+        coordinates     -   A map of each node to its (longitude, latitude) in degrees.
+
+    **Keyword Arguments**
+        scale           -   Multiplier to convert meters to the units of the edge weights.  Default: 1
+        radius          -   The radius of the sphere in meters.  Default: EARTH_RADIUS
+    """
+    radians = {}
+    def to_radians(node):
+        out = radians.get(node)
+        if out is None:
+            longitude, latitude = coordinates[node]
+            out = radians[node] = (math.radians(longitude), math.radians(latitude))
+        return out
+
+    factor = scale * radius
+    def heuristic(node, target):
+        lon1, lat1 = to_radians(node)
+        lon2, lat2 = to_radians(target)
+        # Haversine formula
+        a = math.sin((lat2 - lat1) / 2) ** 2 + \
+            math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+        return factor * 2 * math.asin(min(1, math.sqrt(a)))
+    return heuristic
@@ -0,0 +1,69 @@
+import time
+import multiprocessing
+from priorityq.algorithms.dijkstra import shortest_path_csr, INFINITY
+
+# The graph and storage class of the queries run in this (worker) process
+_graph = None
+_storage_class = None
+
+def shortest_paths(queries, graph, processes = None, storage_class = None, chunksize = 1):
+    """Runs a batch of shortest path queries on a CSR graph over a pool of processes.
+
+    The graph is handed to each worker when the pool is started and not with every query.
+    Where workers are forked (as on unix) they share the pages of the graph's arrays with
+    the parent process till they are written to, which the queries never do, so the graph
+    is not copied.  Results are yielded as soon as they are done and hence not necessarily
+    in the order of the queries.
+
+    **Parameters**
+        queries         -   An iterable of (source, target) tuples.
+        graph           -   A priorityq.algorithms.graph.CSRGraph with non negative integer weights.
+
+    **Keyword Arguments**
+        processes       -   The number of worker processes.  If this is 1 the queries are run
+                            in the calling process.  Default: the number of cpus
+        storage_class   -   The Storage class passed to dijkstra.shortest_path_csr.
+        chunksize       -   The number of queries sent to a worker at a time.  Default: 1
+
+    **Returns**
+        An iterator of (source, target, distance, path, timetaken) tuples, one for each query,
+        where path is the list of nodes from the source to the target (empty if the
+        target cannot be reached) and timetaken is the time in seconds the query took.
+    """
+    if processes == 1:
+        _init_worker(graph, storage_class)
+        try:
+            for query in queries:
+                yield _run_query(query)
+        finally:
+            _init_worker(None, None)
+        return
+
+    pool = multiprocessing.Pool(processes, _init_worker, (graph, storage_class))
+    try:
+        for result in pool.imap_unordered(_run_query, queries, chunksize):
+            yield result
+        pool.close()
+    finally:
+        # Stops any queries that are still running if the caller stopped early
+        pool.terminate()
+        pool.join()
+
+def _init_worker(graph, storage_class):
+    global _graph, _storage_class
+    _graph = graph
+    _storage_class = storage_class
+
+def _run_query(query):
+    source, target = query
+    starttime = time.time()
+    distances, parents = shortest_path_csr(source, target, _graph, _storage_class)
+    distance = distances[target]
+    path = []
+    if distance != INFINITY:
+        node = target
+        while node != -1:
+            path.append(node)
+            node = parents[node]
+        path.reverse()
+    return source, target, distance, path, time.time() - starttime
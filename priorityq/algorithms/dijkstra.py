@@ -1,7 +1,9 @@
 
 import sys
+from array import array
 from priorityq import PQ
-import priorityq.storage
+from priorityq.storage import binheap
+from priorityq.storage import arrayheap
 from collections import defaultdict
 INFINITY = sys.maxint
 
@@ -21,7 +23,7 @@ def shortest_path(source, target, neighbour_func, storage_class = None):
     **Returns**
         A tuple that contains a map of distances for each node from the source along with a map of each node to its parent.
     """
-    storage_class = storage_class or "prioirityq.storage.binheap.Storage"
+    storage_class = storage_class or binheap.Storage
 
     # Keep track of the distance of each node to the source node
     distances = {source: 0, target: INFINITY}
@@ -32,15 +34,19 @@ def shortest_path(source, target, neighbour_func, storage_class = None):
     # The nodes that are known to have the shortest path in each iteration
     known_nodes = set([source])
 
-    # A heap of nodes is used where they nodes are sorted by their distance to the source node
+    # A heap of nodes is used where they nodes are sorted by their distance to the source node.
+    # The distance is used as the key so it is only looked up when a node is pushed or adjusted
+    # instead of on every comparison.
     nodeheap = PQ([source, target], 
                   store = storage_class(),
-                  comparator = lambda x,y: distances[x] - distances[y])
+                  key = distances.__getitem__)
 
     # Add start's neighbours to heap
     for neighbour,neigh_dist in neighbour_func(source):
-        distances[neighbour] = neigh_dist
-        nodeheap.push(neighbour)
+        if neighbour not in distances or neigh_dist < distances[neighbour]:
+            distances[neighbour] = neigh_dist
+            parents[neighbour] = source
+            nodeheap.adjust(neighbour)
 
     last = None
     while last != target and nodeheap:
@@ -60,12 +66,9 @@ def shortest_path(source, target, neighbour_func, storage_class = None):
                 distances[child] = curr_dist
                 parents[child] = currnode
 
-            # Ensure the heap update's the child priority
-            childptr = nodeheap.find(child)
-            if childptr:
-                nodeheap.adjust(childptr)
-            else:
-                nodeheap.push(child)
+                # Ensure the heap update's the child priority (or adds it if
+                # it is not already in the heap)
+                nodeheap.adjust(child)
 
         last = currnode
         known_nodes.add(currnode)
@@ -74,3 +77,136 @@ def shortest_path(source, target, neighbour_func, storage_class = None):
     # backwards to extract the path to the source (in reverse)
     return distances, parents
 
+
+def shortest_path_csr(source, target, graph, storage_class = None):
+    """Return the shortest path from the source to target in a graph of integer nodes.
+
+    This is a faster version of shortest_path for graphs whose nodes are integers in the 
+    range 0 to N - 1 given in compressed sparse row form.  Distances and parents are kept 
+    in typed arrays indexed by node and the nodes are pushed directly onto an array 
+    backed storage that is keyed by the distance array.
+
+    **Parameters**
+        source          -   The source node from which the path is to be calculated
+        target          -   The target node to which the path is to be calculated
+        graph           -   A priorityq.algorithms.graph.CSRGraph with non negative integer weights.
+
+    **Keyword Arguments**
+        storage_class   -   The Storage class that is to be used for the priority queue.  It is 
+                            created with the keyfunc keyword argument.
+                            Default: priorityq.storage.arrayheap.Storage with integer keys
+
+    **Returns**
+        A tuple of two arrays, the distance of each node from the source (INFINITY if it 
+        was not reached) and the parent of each node (-1 if it has none).
+    """
+    numnodes = graph.numnodes
+    offsets, targets, weights = graph.offsets, graph.targets, graph.weights
+    distances = array("l", [INFINITY]) * numnodes
+    parents = array("l", [-1]) * numnodes
+
+    # The handle of each node that is in the heap
+    handles = [None] * numnodes
+
+    if storage_class is None:
+        nodeheap = arrayheap.Storage(keyfunc = distances.__getitem__, typecode = "l")
+    else:
+        nodeheap = storage_class(keyfunc = distances.__getitem__)
+
+    distances[source] = 0
+    handles[source] = nodeheap.push(source)
+    while nodeheap:
+        currnode = nodeheap.pop().value
+        handles[currnode] = None
+        if currnode == target: break
+
+        curr_dist = distances[currnode]
+        for i in xrange(offsets[currnode], offsets[currnode + 1]):
+            child = targets[i]
+            child_dist = curr_dist + weights[i]
+            if child_dist < distances[child]:
+                distances[child] = child_dist
+                parents[child] = currnode
+                handle = handles[child]
+                if handle is None:
+                    handles[child] = nodeheap.push(child)
+                else:
+                    nodeheap.adjust(handle)
+    return distances, parents
+
+def bidirectional_shortest_path(source, target, neighbour_func, reverse_neighbour_func = None, storage_class = None):
+    """Return the shortest path from the source to target by searching forward from the source and backward from the target at the same time.
+
+    The search with the smaller queue is expanded at each step and the search stops as soon as 
+    the sum of the smallest distances in the two queues is no less than the shortest path found 
+    so far through a node reached by both searches.  On road networks this settles roughly half 
+    as many nodes as shortest_path.
+
+    **Parameters**
+        source                  -   The source node from which the path is to be calculated
+        target                  -   The target node to which the path is to be calculated
+        neighbour_func          -   A function that when given a node, returns an iterator of tuples where each tuple is an edge to another node along with the weight of the edge.
+
+    **Keyword Arguments**
+        reverse_neighbour_func  -   A function that when given a node, returns an iterator of tuples 
+                                    for the edges coming into the node along with their weights.
+                                    This is required for directed graphs.  Default: neighbour_func
+        storage_class           -   The Storage class that is to be used for the priority queues.
+                                    Default: prioirityq.storage.binheap.Storage
+
+    **Returns**
+        A tuple of the distance from the source to the target (INFINITY if the target 
+        cannot be reached) and the list of nodes on the path from the source to the target.
+    """
+    storage_class = storage_class or binheap.Storage
+    reverse_neighbour_func = reverse_neighbour_func or neighbour_func
+    if source == target:
+        return 0, [source]
+
+    # Distances, parents and known nodes of the forward (0) and backward (1) searches
+    distances = [{source: 0}, {target: 0}]
+    parents = [{source: None}, {target: None}]
+    known_nodes = [set(), set()]
+    funcs = [neighbour_func, reverse_neighbour_func]
+    nodeheaps = [PQ([source], store = storage_class(), key = distances[0].__getitem__),
+                 PQ([target], store = storage_class(), key = distances[1].__getitem__)]
+
+    best, meeting_node = INFINITY, None
+    while nodeheaps[0] and nodeheaps[1]:
+        if distances[0][nodeheaps[0].top.value] + distances[1][nodeheaps[1].top.value] >= best:
+            break
+
+        # Expand the search with fewer nodes on its frontier
+        side = 0 if len(nodeheaps[0]) <= len(nodeheaps[1]) else 1
+        other_distances = distances[1 - side]
+        side_distances, side_parents, side_heap = distances[side], parents[side], nodeheaps[side]
+
+        currnode = side_heap.pop()
+        known_nodes[side].add(currnode)
+        for child,child_dist in funcs[side](currnode):
+            if child in known_nodes[side]: continue
+            curr_dist = side_distances[currnode] + child_dist
+            if child not in side_distances or curr_dist < side_distances[child]:
+                side_distances[child] = curr_dist
+                side_parents[child] = currnode
+                side_heap.adjust(child)
+
+                # See if the searches have met at a shorter path
+                if child in other_distances and curr_dist + other_distances[child] < best:
+                    best, meeting_node = curr_dist + other_distances[child], child
+
+    if meeting_node is None:
+        return INFINITY, []
+
+    # Walk back to the source and then forward to the target from the meeting node
+    path = []
+    node = meeting_node
+    while node is not None:
+        path.append(node)
+        node = parents[0][node]
+    path.reverse()
+    node = parents[1][meeting_node]
+    while node is not None:
+        path.append(node)
+        node = parents[1][node]
+    return best, path
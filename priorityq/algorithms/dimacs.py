@@ -0,0 +1,80 @@
+import io
+import os
+import gzip
+from array import array
+from priorityq.algorithms.graph import CSRGraph
+
+def open_file(path):
+    """Opens a (possibly gzipped) text file for reading a line at a time."""
+    if path.lower().endswith(".gz"):
+        # GzipFile's own readline is slow so lines are read through a buffer.
+        return io.BufferedReader(gzip.GzipFile(path))
+    return open(path, "rb")
+
+def read_graph(path):
+    """Reads a graph in the DIMACS shortest path format into a CSRGraph.
+
+    The file is read one line at a time and the edges are collected in typed arrays so
+    the text of the file is never held in memory.  The file contains lines of the
+    following format:
+
+        c <comment>
+        p sp <numnodes> <numedges>
+        a <source> <target> <weight>
+
+    **Parameters**
+        path    -   Path of the graph file.  It is decompressed if it ends with ".gz".
+
+    **Returns**
+        A CSRGraph with numnodes + 1 nodes as DIMACS nodes are numbered from 1.
+    """
+    numnodes = 0
+    sources, targets, weights = array("l"), array("l"), array("l")
+    infile = open_file(path)
+    try:
+        for line in infile:
+            if line.startswith("a"):
+                a, source, target, weight = line.split()
+                sources.append(int(source))
+                targets.append(int(target))
+                weights.append(int(weight))
+            elif line.startswith("p"):
+                numnodes = int(line.split()[2])
+    finally:
+        infile.close()
+
+    # Some files leave out the problem line
+    if sources:
+        numnodes = max(numnodes, max(sources), max(targets))
+    return CSRGraph.from_arrays(numnodes + 1, sources, targets, weights)
+
+def load_graph(path, cache_path = None):
+    """Loads a graph in the DIMACS shortest path format, using a binary cache if possible.
+
+    The first time a graph is loaded it is parsed with read_graph and saved to the cache.
+    Later loads read the cache instead as long as it is newer than the graph file and can be
+    read on this platform.
+
+    **Parameters**
+        path        -   Path of the graph file.
+
+    **Keyword Arguments**
+        cache_path  -   Path of the cache file.  Default: path + ".csr"
+
+    **Returns**
+        A CSRGraph as returned by read_graph.
+    """
+    cache_path = cache_path or path + ".csr"
+    if os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(path):
+        try:
+            return CSRGraph.load(cache_path)
+        except ValueError:
+            # Written by an older version or on another platform so it is rewritten
+            pass
+
+    graph = read_graph(path)
+    # Write to a temporary file first so a partially written cache is never read.
+    temp_path = "%s.%d.tmp" % (cache_path, os.getpid())
+    graph.save(temp_path)
+    os.rename(temp_path, cache_path)
+    return graph
@@ -0,0 +1,114 @@
+
+import sys
+import struct
+from array import array
+
+# Header of a saved graph: magic, array typecode, the size in bytes of an item of
+# the arrays (which varies across platforms for the same typecode), whether the
+# arrays are little endian, the number of offsets and the number of edges.
+MAGIC = "PQCSR002"
+HEADER_FORMAT = "<8scB?QQ"
+
+class CSRGraph(object):
+    """
+    A directed graph over integer nodes (0 to numnodes - 1) stored in compressed
+    sparse row form.
+
+    The edges out of node n are at indexes offsets[n] to offsets[n + 1] - 1 of
+    the targets and weights arrays.  Node ids in DIMACS graphs start at 1 so
+    node 0 is simply left without any edges.
+    """
+    def __init__(self, offsets, targets, weights):
+        self.offsets = offsets
+        self.targets = targets
+        self.weights = weights
+
+    @property
+    def numnodes(self):
+        """Returns the number of nodes in the graph."""
+        return len(self.offsets) - 1
+
+    @property
+    def numedges(self):
+        """Returns the number of edges in the graph."""
+        return len(self.targets)
+
+    def neighbours(self, node):
+        """Returns an iterator of (target, weight) tuples for the edges out of a node."""
+        targets, weights = self.targets, self.weights
+        for i in xrange(self.offsets[node], self.offsets[node + 1]):
+            yield targets[i], weights[i]
+
+    @classmethod
+    def from_edges(cls, numnodes, edges):
+        """Creates a graph from an iterable of (source, target, weight) tuples."""
+        sources, targets, weights = array("l"), array("l"), array("l")
+        for source,target,weight in edges:
+            sources.append(source)
+            targets.append(target)
+            weights.append(weight)
+        return cls.from_arrays(numnodes, sources, targets, weights)
+
+    @classmethod
+    def from_arrays(cls, numnodes, sources, targets, weights):
+        """Creates a graph from parallel arrays of edge sources, targets and weights.
+
+        The edges are bucketed by source with a counting sort in O(V + E).
+        """
+        offsets = array("l", [0]) * (numnodes + 1)
+        for source in sources:
+            offsets[source + 1] += 1
+        for node in xrange(numnodes):
+            offsets[node + 1] += offsets[node]
+
+        numedges = len(sources)
+        next_index = array("l", offsets)
+        out_targets = array("l", [0]) * numedges
+        out_weights = array("l", [0]) * numedges
+        for i in xrange(numedges):
+            source = sources[i]
+            index = next_index[source]
+            next_index[source] = index + 1
+            out_targets[index] = targets[i]
+            out_weights[index] = weights[i]
+        return cls(offsets, out_targets, out_weights)
+
+    def save(self, path):
+        """Writes the graph's arrays to a binary file that can be read back with CSRGraph.load."""
+        with open(path, "wb") as outfile:
+            outfile.write(struct.pack(HEADER_FORMAT, MAGIC, self.offsets.typecode, self.offsets.itemsize,
+                                      sys.byteorder == "little", len(self.offsets), len(self.targets)))
+            self.offsets.tofile(outfile)
+            self.targets.tofile(outfile)
+            self.weights.tofile(outfile)
+
+    @classmethod
+    def load(cls, path):
+        """Reads a graph that was written with CSRGraph.save.
+
+        Each array is read with a single call so loading is bound by the speed of the
+        disk (or the page cache) rather than by parsing.  A ValueError is raised if the
+        file is not a saved graph, is truncated or its arrays have a different item size on
+        this platform.
+        """
+        with open(path, "rb") as infile:
+            header = infile.read(struct.calcsize(HEADER_FORMAT))
+            if len(header) != struct.calcsize(HEADER_FORMAT):
+                raise ValueError("%s is not a CSR graph file" % path)
+            magic, typecode, itemsize, little_endian, numoffsets, numedges = struct.unpack(HEADER_FORMAT, header)
+            if magic != MAGIC:
+                raise ValueError("%s is not a CSR graph file" % path)
+            if array(typecode).itemsize != itemsize:
+                raise ValueError("%s has %d byte items of type '%s' which are %d bytes on this platform" %
+                                 (path, itemsize, typecode, array(typecode).itemsize))
+            arrays = []
+            for count in [numoffsets, numedges, numedges]:
+                values = array(typecode)
+                try:
+                    values.fromfile(infile, count)
+                except EOFError:
+                    raise ValueError("%s is truncated" % path)
+                if little_endian != (sys.byteorder == "little"):
+                    values.byteswap()
+                arrays.append(values)
+        return cls(*arrays)
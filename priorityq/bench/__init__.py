@@ -0,0 +1,82 @@
+"""
+Micro benchmarks of the storages in priorityq.storage.
+
+Run all the workloads against all the storages and print the results as JSON with:
+
+    python -m priorityq.bench [--storages binheap,pairingheap] [--workloads push,adjust] [--sizes 100,10000]
+
+By default a workload stops growing once a run takes longer than TIME_LIMIT seconds, and
+storages whose operations take linear time are only run with the default sizes upto their
+entry in MAX_SIZES.
+"""
+
+import sys
+import random
+import platform
+import importlib
+from workloads import WORKLOADS
+
+STORAGES = ["listheap", "binheap", "arrayheap", "pairingheap", "binomialheap",
+            "fibheap", "daryheap", "compactheap", "radixheap", "timerwheel",
+            "external"]
+
+SIZES = [10 ** 2, 10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6, 10 ** 7]
+
+# The largest of the default sizes run against a storage.  A listheap drain of 10 ** 4 values
+# already takes about half a minute.
+MAX_SIZES = {"listheap": 10 ** 3}
+
+TIME_LIMIT = 10
+
+def run(storages = None, workloads = None, sizes = None, repeat = 1, time_limit = TIME_LIMIT, seed = 0):
+    """Runs workloads against storages and yields a dict with the result of each run.
+
+    **Keyword Arguments**
+        storages    -   Names of the modules in priorityq.storage to benchmark.  Default: STORAGES
+        workloads   -   The workload functions to run.  Default: workloads.WORKLOADS
+        sizes       -   The number of values to run each workload with.  Default: SIZES, upto
+                        the storage's entry in MAX_SIZES
+        repeat      -   The number of times each run is repeated.  The fastest one is reported.  Default: 1
+        time_limit  -   If a run takes longer than this many seconds then the larger sizes of
+                        the same workload and storage are skipped.  None runs all the sizes.
+                        Default: TIME_LIMIT
+        seed        -   The seed of the random numbers used by the workloads.  Default: 0
+
+    **Returns**
+        An iterator of dicts with the storage, workload, size, number of operations, the
+        seconds they took and the operations per second.
+    """
+    storages = storages or STORAGES
+    workloads = workloads or WORKLOADS
+    for storage in storages:
+        storage_class = importlib.import_module("priorityq.storage." + storage).Storage
+        if sizes:
+            storage_sizes = sorted(sizes)
+        else:
+            storage_sizes = [size for size in SIZES if size <= MAX_SIZES.get(storage, size)]
+        for workload in workloads:
+            for size in storage_sizes:
+                timings = []
+                for i in xrange(repeat):
+                    ops, seconds = workload(storage_class, size, random.Random(seed))
+                    timings.append(seconds)
+                seconds = min(timings)
+                yield {
+                    "storage": storage,
+                    "workload": workload.__name__,
+                    "size": size,
+                    "ops": ops,
+                    "seconds": seconds,
+                    "ops_per_second": ops / seconds if seconds > 0 else None
+                }
+                if time_limit is not None and seconds > time_limit:
+                    break
+
+def environment():
+    """Returns a dict that describes where the benchmarks were run."""
+    return {
+        "python": sys.version.split()[0],
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+    }
@@ -0,0 +1,52 @@
+import sys
+import json
+import argparse
+from priorityq import bench
+from priorityq.bench import workloads
+
+def main(args = None):
+    parser = argparse.ArgumentParser(prog = "python -m priorityq.bench",
+                                     description = "Benchmarks priorityq storages and prints the results as JSON.")
+    parser.add_argument("--storages", default = ",".join(bench.STORAGES),
+                        help = "Comma separated names of modules in priorityq.storage")
+    parser.add_argument("--workloads", default = ",".join(w.__name__ for w in workloads.WORKLOADS),
+                        help = "Comma separated names of workloads")
+    parser.add_argument("--sizes", default = None,
+                        help = "Comma separated number of values to run each workload with.  Default: %s (upto %s)" %
+                               (",".join(str(s) for s in bench.SIZES),
+                                ", ".join("%d for %s" % (size, storage) for storage,size in sorted(bench.MAX_SIZES.items()))))
+    parser.add_argument("--repeat", type = int, default = 1,
+                        help = "Number of times each run is repeated (the fastest is reported)")
+    parser.add_argument("--time-limit", type = float, default = bench.TIME_LIMIT,
+                        help = "Skip the larger sizes of a workload once a run takes longer than this many "
+                               "seconds (0 or less for no limit).  Default: %(default)s")
+    parser.add_argument("--seed", type = int, default = 0)
+    parser.add_argument("--output", default = None, help = "File to write the JSON to.  Default: stdout")
+    args = parser.parse_args(args)
+
+    selected = []
+    for name in args.workloads.split(","):
+        workload = getattr(workloads, name, None)
+        if workload not in workloads.WORKLOADS:
+            parser.error("Unknown workload: %s" % name)
+        selected.append(workload)
+
+    results = []
+    for result in bench.run(storages = args.storages.split(","),
+                            workloads = selected,
+                            sizes = args.sizes and [int(float(s)) for s in args.sizes.split(",")],
+                            repeat = args.repeat,
+                            time_limit = args.time_limit if args.time_limit > 0 else None,
+                            seed = args.seed):
+        sys.stderr.write("%(storage)s %(workload)s %(size)d: %(seconds)f seconds\n" % result)
+        results.append(result)
+
+    output = json.dumps({"environment": bench.environment(), "results": results}, indent = 2, sort_keys = True)
+    if args.output:
+        with open(args.output, "w") as outfile:
+            outfile.write(output + "\n")
+    else:
+        print output
+
+if __name__ == "__main__":
+    main()
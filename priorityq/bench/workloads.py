@@ -0,0 +1,77 @@
+"""
+Synthetic workloads for benchmarking storages.
+
+Each workload is called with a storage class, the number of values to work with and a
+random number generator.  It sets up a PQ (which is not timed), runs its operations and
+returns the number of operations that were timed along with the time they took in seconds.
+
+Keys are non negative integers and are never pushed below the last popped key so that
+every workload can also be run against storages (like radixheap) that need monotone keys.
+"""
+
+from timeit import default_timer as timer
+from priorityq import PQ
+
+def push(storage_class, size, rnd):
+    """Pushes values in random order onto an empty PQ."""
+    values = [rnd.randint(0, size) for i in xrange(size)]
+    pq = PQ(store = storage_class(), duplicates = True)
+    starttime = timer()
+    for value in values:
+        pq.push(value)
+    return size, timer() - starttime
+
+def pop_drain(storage_class, size, rnd):
+    """Pops all the values from a PQ."""
+    pq = PQ(xrange(size), store = storage_class())
+    starttime = timer()
+    while pq:
+        pq.pop()
+    return size, timer() - starttime
+
+def push_pop(storage_class, size, rnd):
+    """Alternates pops and pushes on a PQ that is kept at the same size.
+
+    Each pushed key is a random amount larger than the popped one as in event
+    simulations (the hold model).
+    """
+    pq = PQ([rnd.randint(0, size) for i in xrange(size)], store = storage_class(), duplicates = True)
+    increments = [rnd.randint(0, size) for i in xrange(size)]
+    starttime = timer()
+    for increment in increments:
+        pq.push(pq.pop() + increment)
+    return 2 * size, timer() - starttime
+
+def adjust(storage_class, size, rnd):
+    """Changes the priorities of values in a PQ, half of them decreases and half increases."""
+    priorities = [rnd.randint(size, 2 * size) for i in xrange(size)]
+    pq = PQ(xrange(size), store = storage_class(), key = priorities.__getitem__)
+    changes = [(rnd.randint(0, size - 1), rnd.randint(0, 3 * size)) for i in xrange(size)]
+    starttime = timer()
+    for value,priority in changes:
+        priorities[value] = priority
+        pq.adjust(value)
+    return size, timer() - starttime
+
+def remove(storage_class, size, rnd):
+    """Removes all values from a PQ in random order."""
+    values = range(size)
+    pq = PQ(values, store = storage_class())
+    rnd.shuffle(values)
+    starttime = timer()
+    for value in values:
+        pq.remove(value)
+    return size, timer() - starttime
+
+def duplicates(storage_class, size, rnd):
+    """Pushes values with many duplicates (about ten of each) and pops them all."""
+    values = [rnd.randint(0, size / 10) for i in xrange(size)]
+    pq = PQ(store = storage_class(), duplicates = True)
+    starttime = timer()
+    for value in values:
+        pq.push(value)
+    while pq:
+        pq.pop()
+    return 2 * size, timer() - starttime
+
+WORKLOADS = [push, pop_drain, push_pop, adjust, remove, duplicates]
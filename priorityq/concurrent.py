@@ -0,0 +1,255 @@
+import threading
+from time import time as _time
+from collections import deque
+from Queue import Empty
+from core import PQ
+
+# AsyncPQ needs trollius, the backport of asyncio for python 2, whose coroutines
+# wait with "yield From(future)" and return with "raise Return(value)"
+try:
+    import trollius as asyncio
+    from trollius import From, Return, coroutine
+except ImportError:
+    asyncio = None
+    coroutine = lambda func: func
+
+class BlockingPQ(object):
+    """A thread safe PQ whose consumers block till values are available.
+
+    Unlike Queue.PriorityQueue values can be adjusted and removed after they have been put.
+    All operations hold a single lock only for the duration of the underlying PQ operation
+    and consumers waiting for values are woken with a condition variable (instead of polling)
+    only when values are added.  Batches of values can be put and taken with a single
+    acquisition of the lock with put_many and get_many.
+    """
+    def __init__(self, values = None, comparator = cmp, duplicates = False, store = None, key = None):
+        """Returns a new BlockingPQ.  The parameters are the same as those of PQ."""
+        self._pq = PQ(values, comparator = comparator, duplicates = duplicates, store = store, key = key)
+        self._mutex = threading.Lock()
+        self._not_empty = threading.Condition(self._mutex)
+
+    def put(self, value):
+        """Puts a value into the PQ waking up a consumer waiting for one."""
+        with self._mutex:
+            count = len(self._pq)
+            self._pq.push(value)
+            if len(self._pq) > count:
+                self._not_empty.notify()
+
+    def put_many(self, values):
+        """Puts a collection of values into the PQ waking up as many consumers as values added."""
+        with self._mutex:
+            count = len(self._pq)
+            self._pq.push_many(values)
+            added = len(self._pq) - count
+            if added > 0:
+                self._not_empty.notify(added)
+
+    def get(self, block = True, timeout = None):
+        """Removes the top value from the PQ and returns it.
+
+        **Keyword Arguments**
+            block   -   If False a value is only returned if one is available right away.  Default: True
+            timeout -   The maximum number of seconds to wait for a value.  Default: None (wait forever)
+
+        Raises Queue.Empty if no value was available.
+        """
+        with self._not_empty:
+            self._wait(block, timeout)
+            return self._pq.pop()
+
+    def get_many(self, count, block = True, timeout = None):
+        """Removes upto count values from the top of the PQ and returns them in order.
+
+        The call waits (as get) only till the first value is available and then returns
+        the values available at that point without waiting for any more.
+        """
+        with self._not_empty:
+            self._wait(block, timeout)
+            pq = self._pq
+            out = pq.pop_many(count)
+            if pq:
+                # Other consumers may have been waiting along with this one
+                self._not_empty.notify()
+            return out
+
+    def adjust(self, value):
+        """Re-prioritises a value that has been modified (or puts it if it is not in the PQ)."""
+        with self._mutex:
+            count = len(self._pq)
+            self._pq.adjust(value)
+            if len(self._pq) > count:
+                self._not_empty.notify()
+
+    def remove(self, value):
+        """Removes a value from the PQ.  Raises KeyError if the value is not in the PQ."""
+        with self._mutex:
+            if self._pq.find(value) is None:
+                raise KeyError(value)
+            self._pq.remove(value)
+
+    def peek(self):
+        """Returns the top value without removing it.  Raises Queue.Empty if the PQ is empty."""
+        with self._mutex:
+            if not self._pq:
+                raise Empty
+            return self._pq.top.value
+
+    def __contains__(self, value):
+        with self._mutex:
+            return self._pq.find(value) is not None
+
+    def __len__(self):
+        with self._mutex:
+            return len(self._pq)
+
+    def qsize(self):
+        """Returns the number of values in the PQ."""
+        return len(self)
+
+    def empty(self):
+        """Returns True if the PQ has no values."""
+        return len(self) == 0
+
+    def _wait(self, block, timeout):
+        """Waits till the PQ has a value.  Must be called with the lock held."""
+        pq = self._pq
+        if pq: return
+        if not block:
+            raise Empty
+        if timeout is None:
+            while not pq:
+                self._not_empty.wait()
+        elif timeout < 0:
+            raise ValueError("'timeout' must be a non-negative number")
+        else:
+            endtime = _time() + timeout
+            while not pq:
+                remaining = endtime - _time()
+                if remaining <= 0.0:
+                    raise Empty
+                self._not_empty.wait(remaining)
+
+class AsyncPQ(object):
+    """A PQ for asyncio event loops whose consumers wait for values without polling.
+
+    pop and pop_until are coroutines.  As with asyncio.Queue, a waiting consumer is only
+    woken when a value is pushed and pops the top value once it resumes, so it gets the
+    smallest value at that point and a consumer that is cancelled before resuming does not
+    take a value.  Consumers are woken in the order they started waiting.  Values can be
+    adjusted and removed while consumers are waiting.  An AsyncPQ is not thread safe and
+    must only be used from the thread running its loop.
+    """
+    def __init__(self, values = None, comparator = cmp, duplicates = False, store = None, key = None, loop = None):
+        """Returns a new AsyncPQ.  The parameters are the same as those of PQ along with:
+
+        **Keyword Arguments**
+            loop    -   The event loop the futures belong to.  Default: asyncio.get_event_loop()
+        """
+        if asyncio is None:
+            raise ImportError("AsyncPQ requires asyncio (or trollius)")
+        self._pq = PQ(values, comparator = comparator, duplicates = duplicates, store = store, key = key)
+        self._loop = loop or asyncio.get_event_loop()
+        self._waiters = deque()
+
+    def push(self, value):
+        """Pushes a value onto the PQ waking up a waiting consumer if any.  Returns its handle."""
+        count = len(self._pq)
+        handle = self._pq.push(value)
+        self._wake(len(self._pq) - count)
+        return handle
+
+    def push_many(self, values):
+        """Pushes a collection of values onto the PQ waking up as many consumers as values added.
+
+        Returns handles to the values that were added.
+        """
+        count = len(self._pq)
+        handles = self._pq.push_many(values)
+        self._wake(len(self._pq) - count)
+        return handles
+
+    def adjust(self, value_or_handle):
+        """Re-prioritises a value that has been modified (or pushes it if it is not in the PQ)."""
+        count = len(self._pq)
+        handle = self._pq.adjust(value_or_handle)
+        self._wake(len(self._pq) - count)
+        return handle
+
+    def remove(self, value_or_handle):
+        """Removes a value from the PQ.  Raises KeyError if the value is not in the PQ."""
+        self._pq.remove(value_or_handle)
+
+    def find(self, value):
+        """Returns a handle to the given value or None if it is not in the PQ."""
+        return self._pq.find(value)
+
+    @coroutine
+    def pop(self):
+        """Removes and returns the top value, waiting till one is available.  A coroutine."""
+        yield From(self._wait())
+        raise Return(self._pq.pop())
+
+    @coroutine
+    def pop_until(self, deadline):
+        """Removes and returns the top value, waiting till one is available.  A coroutine.
+
+        If no value is available by the deadline (in terms of the loop's time) then
+        asyncio.TimeoutError is raised.
+        """
+        yield From(self._wait(deadline))
+        raise Return(self._pq.pop())
+
+    def pop_nowait(self):
+        """Removes and returns the top value.  Raises asyncio.QueueEmpty if no value is available."""
+        if not self._pq:
+            raise asyncio.QueueEmpty
+        return self._pq.pop()
+
+    @property
+    def top(self):
+        """Returns a handle to the top value."""
+        return self._pq.top
+
+    def __len__(self):
+        return len(self._pq)
+
+    def __contains__(self, value):
+        return self._pq.find(value) is not None
+
+    @coroutine
+    def _wait(self, deadline = None):
+        """Waits till the PQ has a value."""
+        while not self._pq:
+            waiter = asyncio.Future(loop = self._loop)
+            self._waiters.append(waiter)
+            timer = None
+            if deadline is not None:
+                timer = self._loop.call_at(deadline, self._expire, waiter)
+            try:
+                yield From(waiter)
+            except:
+                waiter.cancel()
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                # A consumer that was woken but cancelled before it resumed passes the wake on
+                if self._pq and not waiter.cancelled():
+                    self._wake(1)
+                raise
+            finally:
+                if timer is not None:
+                    timer.cancel()
+
+    def _wake(self, count):
+        """Wakes up to count waiting consumers."""
+        waiters = self._waiters
+        while waiters and count > 0:
+            waiter = waiters.popleft()
+            # Consumers that were cancelled or timed out are no longer waiting
+            if not waiter.done():
+                waiter.set_result(None)
+                count -= 1
+
+    def _expire(self, waiter):
+        if not waiter.done():
+            waiter.set_exception(asyncio.TimeoutError())
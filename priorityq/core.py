@@ -1,9 +1,14 @@
 # -*- coding: utf-8 -*-
+import cPickle as pickle
+from itertools import izip
+
+# Identifies the files written by PQ.dump
+DUMP_FORMAT = "priorityq.PQ/1"
 
 class PQ(object):
     """A flexible PriorityQueue wrapper to allow deletions, fast findings and updates of element priorities."""
     def __init__(self, values = None, comparator = cmp,
-                 duplicates = False, store = None):
+                 duplicates = False, store = None, key = None, maxsize = None):
         """Returns a new PriorityQueue instance.
 
         Parameters:
@@ -13,26 +18,42 @@ class PQ(object):
                             If one is not provided then the standard comparator (cmp) is used.
             duplicates  --  This boolean flag (default = False) specifies whether duplicate 
                             values are stored seperately or not.  If False, then only one instance
-                            of a value can be in the PQ at a time.
+                            of a value can be in the PQ at a time.  If True, then the handles of
+                            the instances of each value are kept in a set so that an instance is
+                            added or removed in O(1) regardless of the number of duplicates.
             store       --  By default the PriorityQueue uses a binary heap to organise the values.
                             This can be overridden by any other instances that inherits the Storage
                             class.  See Storage for more details.
+            key         --  An optional function that computes the priority (key) of a value.  
+                            Keys are computed once when a value is pushed or adjusted and are 
+                            cached by the storage so that ordering the values does not call back
+                            into Python code for every comparison.  When a key function is provided
+                            the comparator is applied to the keys instead of the values.
+            maxsize     --  If set then at most this many values are kept in the PQ.  A value pushed
+                            onto a full PQ evicts the worst (last to be popped) value in it, or is
+                            dropped if it is no better than the worst value, in O(log maxsize).
+                            The worst values are tracked in a second heap ordered the other way.
         """
         if store is None:
             from storage import binheap
             store = binheap.Storage()
+        if maxsize is not None and maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
         self.duplicates = duplicates
         self.storage = store
+        self.storage.key = key
         self.storage.comparator = comparator
+        self.maxsize = maxsize
 
         self.handlesByValue = {}
+        if maxsize is not None:
+            from storage import compactheap
+            # Handles of the values in the storage, with the worst value at the top
+            self._worst = compactheap.Storage(lambda x,y: self.storage.comparator(y, x),
+                                              lambda handle: handle.key)
+            self._worstHandles = {}
         if values:
-            values = set(values) or []
-            handles = self.storage.heapify(values)
-            if self.duplicates:
-                for h in handles: self.handlesByValue[h.value] = [h]
-            else:
-                for h in handles: self.handlesByValue[h.value] = h
+            self.push_many(values)
 
     @property
     def top(self):
@@ -42,10 +63,9 @@ class PQ(object):
     def pop(self):
         """Removes the top value from the PQ and returns its value."""
         handle = self.storage.pop()
-        if self.duplicates:
-            self.handlesByValue[handle.value].remove(handle)
-        else:
-            del self.handlesByValue[handle.value]
+        if self.maxsize is not None:
+            self._worst.remove(self._worstHandles.pop(handle))
+        self._forget(handle)
         return handle.value
 
     def push(self, value):
@@ -53,39 +73,105 @@ class PQ(object):
 
         If the value already exists, then the value is only added again to the storage if the duplicates flag is set to False.
 
-        Returns a handle to the value within the PQ.
+        Returns a handle to the value within the PQ.  If the PQ has a maxsize and is full
+        then None is returned if the value was dropped instead of being added.
         """
+        if self.maxsize is not None and len(self.storage) >= self.maxsize and \
+                (self.duplicates or value not in self.handlesByValue):
+            # Drop the value if it is no better than the worst value or evict the worst value
+            worst = self._worst.top().value
+            keyfunc = self.storage.key
+            if self.storage.comparator(value if keyfunc is None else keyfunc(value), worst.key) >= 0:
+                return None
+            self._evict(worst)
+
         if self.duplicates:
             ptr = self.storage.push(value)
             if value not in self.handlesByValue:
-                self.handlesByValue[value] = []
-            self.handlesByValue[value].append(ptr)
+                self.handlesByValue[value] = set()
+            self.handlesByValue[value].add(ptr)
         elif value not in self.handlesByValue:
             ptr = self.storage.push(value)
             self.handlesByValue[value] = ptr
         else:
-            ptr = self.handlesByValue[value]
+            return self.handlesByValue[value]
+        if self.maxsize is not None:
+            self._worstHandles[ptr] = self._worst.push(ptr)
         return ptr
 
+    def _evict(self, handle):
+        """Removes the value referred by a handle when the PQ is full."""
+        self.storage.remove(handle)
+        self._worst.remove(self._worstHandles.pop(handle))
+        self._forget(handle)
+
+    def _forget(self, handle):
+        """Drops a handle that has been removed from the storage from handlesByValue."""
+        if self.duplicates:
+            handles = self.handlesByValue[handle.value]
+            handles.remove(handle)
+            if not handles:
+                del self.handlesByValue[handle.value]
+        else:
+            del self.handlesByValue[handle.value]
+
+    def push_many(self, values):
+        """Pushes a collection of values onto the PQ.
+
+        Values already in the PQ are skipped unless the duplicates flag is set.  If
+        the number of new values is larger than the number of values already in the PQ
+        then the storage is rebuilt with all the values at once (see Storage.heapify),
+        which for array based storages takes O(n) instead of O(n log n) comparisons.
+
+        Returns a list of handles to the values that were added.
+        """
+        if self.maxsize is not None:
+            # Values are only kept if they are better than the worst one so far
+            return [h for h in map(self.push, values) if h is not None]
+
+        if self.duplicates:
+            values = list(values)
+        else:
+            seen = set()
+            unique = []
+            for value in values:
+                if value not in self.handlesByValue and value not in seen:
+                    seen.add(value)
+                    unique.append(value)
+            values = unique
+
+        if len(values) > len(self.storage):
+            handles = self.storage.heapify(values)
+        else:
+            handles = [self.storage.push(value) for value in values]
+
+        if self.duplicates:
+            for h in handles:
+                if h.value not in self.handlesByValue:
+                    self.handlesByValue[h.value] = set()
+                self.handlesByValue[h.value].add(h)
+        else:
+            for h in handles: self.handlesByValue[h.value] = h
+        return handles
+
     def adjust(self, value_or_handle):
         """ Called to reevaluate the position of an entry within the heap.
 
         This is usually called after an entry has been modified such that its position in the heap would have changed (due to a change in its priority).
+        If a key function is in use then the key of the value is recomputed.
+
+        If the value is not in the PQ then it is pushed onto it.  If duplicates are allowed
+        then all instances of a value that is passed are adjusted but only the instance
+        referred by a handle is.
         """
-        handle = None
-        value = value_or_handle
-        if value_or_handle in self.handlesByValue:
-            # A value was passed so adjust it by its handle
-            handle = self.handlesByValue[value_or_handle]
-        elif hasattr(value_or_handle, "value"):
-            value = value_or_handle.value
-            if value_or_handle.value in self.handlesByValue:
-                handle = self.handlesByValue[value_or_handle.value]
-        if handle:
+        value, handles = self._lookup(value_or_handle)
+        if not handles:
+            return self.push(value)
+        for handle in handles:
             self.storage.adjust(handle)
-        else:
-            handle = self.storage.push(value)
-        return handle
+            if self.maxsize is not None:
+                self._worst.adjust(self._worstHandles[handle])
+        return handles[0]
 
     def remove(self, value_or_handle):
         """Removes a given value from the PQ.
@@ -93,32 +179,216 @@ class PQ(object):
         If a handle is passed instead of a value then only the value referred by the handle is
         removed (regardless of other duplicates).
         To remove all instances of a value from the PQ, pass the value instead.
+
+        Raises KeyError if the value (or the instance referred by the handle) is not in the PQ.
+        """
+        value, handles = self._lookup(value_or_handle)
+        if not handles:
+            raise KeyError(value)
+        for handle in handles:
+            self.storage.remove(handle)
+            if self.maxsize is not None:
+                self._worst.remove(self._worstHandles.pop(handle))
+            self._forget(handle)
+
+    def pop_many(self, count):
+        """Removes upto count values from the top of the PQ and returns them in order.
+
+        The values are popped from the storage in one go (see Storage.pop_many).
         """
-        handle = None
+        handles = self.storage.pop_many(count)
+        if self.maxsize is not None:
+            self._worst.remove_many([self._worstHandles.pop(h) for h in handles])
+        for h in handles: self._forget(h)
+        return [h.value for h in handles]
+
+    def adjust_many(self, values_or_handles):
+        """Reevaluates the positions of a collection of values (or handles) within the heap.
+
+        The storage adjusts all of them in one go (see Storage.adjust_many).  If duplicates are
+        allowed then all instances of a value that is passed are adjusted.  Values that are not
+        in the PQ are pushed onto it.
+
+        Returns a list of handles to the adjusted and pushed values.
+        """
+        handles, missing = [], []
+        for value_or_handle in values_or_handles:
+            value, found = self._lookup(value_or_handle)
+            if found:
+                handles.extend(found)
+            else:
+                missing.append(value)
+        handles = _unique(handles)
+        self.storage.adjust_many(handles)
+        if self.maxsize is not None:
+            self._worst.adjust_many([self._worstHandles[h] for h in handles])
+        if missing:
+            handles.extend(self.push_many(missing))
+        return handles
+
+    def remove_many(self, values_or_handles):
+        """Removes a collection of values (or handles) from the PQ.
+
+        As with remove, all instances of a value that is passed are removed but only the
+        instance referred by a handle is.  Values that are not in the PQ are ignored.  The
+        storage removes all of them in one go (see Storage.remove_many).
+        """
+        handles = []
+        for value_or_handle in values_or_handles:
+            handles.extend(self._lookup(value_or_handle)[1])
+        handles = _unique(handles)
+        self.storage.remove_many(handles)
+        if self.maxsize is not None:
+            self._worst.remove_many([self._worstHandles.pop(h) for h in handles])
+        for h in handles: self._forget(h)
+
+    def _lookup(self, value_or_handle):
+        """Returns the value referred by a value or a handle along with a list of its handles
+        in the PQ (which is empty if the value is not in the PQ)."""
+        handlesByValue = self.handlesByValue
         value = value_or_handle
-        if value_or_handle in self.handlesByValue:
-            # A value was passed so adjust it by its handle
-            handle = self.handlesByValue[value_or_handle]
+        if value_or_handle in handlesByValue:
+            handles = handlesByValue[value_or_handle]
         elif hasattr(value_or_handle, "value"):
             value = value_or_handle.value
-            if value_or_handle.value in self.handlesByValue:
-                handle = self.handlesByValue[value_or_handle.value]
-        if handle:
-            self.storage.remove(handle)
+            handles = handlesByValue.get(value)
+            # Only the instance referred by the handle, which is stale if its value has
+            # since been removed (even if the value has been pushed again)
+            if handles and self.duplicates:
+                handles = [value_or_handle] if value_or_handle in handles else None
+            elif handles is not None and handles != value_or_handle:
+                handles = None
+        else:
+            handles = None
+        if not handles:
+            return value, []
+        return value, (list(handles) if self.duplicates else [handles])
+
+    def merge(self, another):
+        """Moves all the values of another PQ into this PQ leaving the other PQ empty.
+
+        If both PQs use the same kind of mergeable storage (eg binomialheap or pairingheap)
+        ordered by the same comparator and key function then the storages are melded directly
+        (in O(log n) for binomial heaps) and handles to values from the other PQ remain valid.
+        Otherwise the values are pushed onto this PQ.
+
+        If the duplicates flag is not set then values already in this PQ are not added again.
+        If this PQ has a maxsize then only the best values are kept and the storages are
+        never melded.
+        """
+        if another.maxsize is not None:
+            another._worst.clear()
+            another._worstHandles = {}
+        if self.maxsize is None and self.storage.merge(another.storage):
+            for value,handles in another.handlesByValue.iteritems():
+                if not another.duplicates:
+                    handles = [handles]
+                if self.duplicates:
+                    if value not in self.handlesByValue:
+                        self.handlesByValue[value] = set()
+                    self.handlesByValue[value].update(handles)
+                else:
+                    handles = list(handles)
+                    if value not in self.handlesByValue:
+                        self.handlesByValue[value] = handles[0]
+                        handles = handles[1:]
+                    for h in handles:
+                        self.storage.remove(h)
+        else:
+            values = []
+            for value,handles in another.handlesByValue.iteritems():
+                values.extend([value] * (len(handles) if another.duplicates else 1))
+            another.storage.clear()
+            self.push_many(values)
+        another.handlesByValue = {}
+
+    def dump(self, fileobj):
+        """Writes the contents of the PQ to a file so it can be restored with PQ.load.
+
+        The values are written along with their cached keys and the layout of the storage
+        (see Storage.snapshot), so that restoring the PQ with the same kind of storage does
+        not recompute any keys or compare any values.  Values (and keys) must be picklable.
+        """
+        handles, layout = self.storage.snapshot()
+        indexes = dict((h, i) for i,h in enumerate(handles))
+        groups = None
         if self.duplicates:
-            self.handlesByValue[handle.value].remove(handle)
+            # The handles of each value by their position in the snapshot
+            groups = [[indexes[h] for h in hs] for hs in self.handlesByValue.itervalues() if hs]
+        pickler = pickle.Pickler(fileobj, pickle.HIGHEST_PROTOCOL)
+        pickler.dump((DUMP_FORMAT, self.duplicates, self.maxsize, layout))
+        pickler.dump([h.value for h in handles])
+        pickler.dump(None if self.storage.key is None else [h.key for h in handles])
+        pickler.dump(groups)
+
+    @classmethod
+    def load(cls, fileobj, comparator = cmp, store = None, key = None):
+        """Returns a new PQ with the contents written by PQ.dump.
+
+        The comparator, storage and key function are as in the constructor and must order
+        the values the same way as those of the dumped PQ.  If the storage understands the
+        dumped layout then it is restored as is in linear time without any comparisons.
+        Otherwise the values are heapified.  A key function must be given if (and only if)
+        the dumped PQ had one, otherwise a ValueError is raised.
+
+        The file is read with pickle, which can run arbitrary code while unpickling, so
+        load must never be given a file from an untrusted source.
+
+        Restoring creates a handle for each value and the cyclic garbage collector traverses
+        all the objects created so far every few hundred of them.  Callers loading large
+        dumps can make the load noticeably faster by disabling it around the call, eg::
+
+            gc.disable()
+            try:
+                pq = PQ.load(infile)
+            finally:
+                gc.enable()
+        """
+        unpickler = pickle.Unpickler(fileobj)
+        header = unpickler.load()
+        if not isinstance(header, tuple) or header[0] != DUMP_FORMAT:
+            raise ValueError("Not a dump of a PQ")
+        duplicates, maxsize, layout = header[1:]
+        values = unpickler.load()
+        keys = unpickler.load()
+        groups = unpickler.load()
+        if (keys is None) != (key is None):
+            if keys is None:
+                raise ValueError("The dumped PQ has no key function but one was given")
+            raise ValueError("The dumped PQ has a key function but none was given")
+
+        pq = cls(comparator = comparator, duplicates = duplicates, store = store, key = key, maxsize = maxsize)
+        handles = pq.storage.restore(values, values if keys is None else keys, layout)
+        if duplicates:
+            for group in groups:
+                pq.handlesByValue[values[group[0]]] = set(handles[i] for i in group)
         else:
-            del self.handlesByValue[handle.value]
+            pq.handlesByValue = dict(izip(values, handles))
+        if maxsize is not None:
+            pq._worstHandles = dict(izip(handles, pq._worst.heapify(handles)))
+        return pq
 
     def find(self, value):
-        """Returns a handle to the first instance of a particular value.
+        """Returns a handle to an instance of a particular value or None if it is not in the PQ.
         """
         if self.duplicates:
-            v = self.handlesByValue.get(value, [])
-            if v: v = v[0]
-        else:
-            v = self.handlesByValue.get(value, None)
-        return v
+            handles = self.handlesByValue.get(value)
+            return next(iter(handles)) if handles else None
+        return self.handlesByValue.get(value, None)
+
+    def find_all(self, value):
+        """Returns a list of handles to all the instances of a particular value."""
+        handles = self.handlesByValue.get(value)
+        if not handles:
+            return []
+        return list(handles) if self.duplicates else [handles]
+
+    def count(self, value):
+        """Returns the number of instances of a particular value in the PQ."""
+        handles = self.handlesByValue.get(value)
+        if not handles:
+            return 0
+        return len(handles) if self.duplicates else 1
 
     def __iter__(self):
         return iter(self.storage)
@@ -128,3 +398,13 @@ class PQ(object):
 
     def __nonzero__(self):
         return self.storage.__nonzero__()
+
+def _unique(handles):
+    """Returns a list of handles without repeats in their original order."""
+    seen = set()
+    out = []
+    for h in handles:
+        if h not in seen:
+            seen.add(h)
+            out.append(h)
+    return out
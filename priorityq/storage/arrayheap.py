@@ -0,0 +1,321 @@
+
+from array import array
+from base import Storage as BaseStorage
+
+class Handle(object):
+    """
+    A lightweight handle to a slot in an array backed heap.
+
+    Unlike other handles this does not track the position of its value.  The
+    key is looked up in the parallel arrays of the storage so that moving an
+    element within the heap never touches the handle.  Handles are created
+    on demand and two handles are equal if they refer to the same slot in
+    the same generation, ie the slot has not been released and reused by
+    another value in between.  A handle is only valid while its value is in
+    the heap.  Once the value is popped or removed the handle is stale and
+    keeps referring to the value, with the key it had when it was last seen
+    by the handle.
+    """
+    __slots__ = ("_storage", "_value", "_key", "slot", "generation")
+
+    def __init__(self, storage, slot):
+        self._storage = storage
+        # The value in a slot only changes when the slot is reused
+        self._value = storage._values[slot]
+        self._key = storage._keys[slot]
+        self.slot = slot
+        self.generation = storage._generations[slot]
+
+    @property
+    def value(self):
+        """Returns the value pointed by the handle."""
+        return self._value
+
+    @property
+    def key(self):
+        """Returns the cached key of the value pointed by the handle."""
+        if self._is_stale():
+            return self._key
+        self._key = self._storage._keys[self.slot]
+        return self._key
+
+    def _is_stale(self):
+        """Returns True if the value of the handle is no longer in the heap."""
+        storage = self._storage
+        return storage is None or storage._generations[self.slot] != self.generation
+
+    def __eq__(self, another):
+        return isinstance(another, Handle) and self.slot == another.slot and \
+                self.generation == another.generation
+
+    def __ne__(self, another):
+        return not self.__eq__(another)
+
+    def __hash__(self):
+        return hash((self.slot, self.generation))
+
+    def __repr__(self): return str(self)
+    def __str__(self):
+        return "<Ptr (0x%x), Slot: %d, Value: %s>" % (id(self), self.slot, str(self.value))
+
+class Storage(BaseStorage):
+    """
+    A binary heap of numeric keys held in typed arrays.
+
+    Each value is given an integer slot.  The key of the value (as returned by
+    the key function, or the value itself) is held in a typed array and the
+    value in a parallel list, both indexed by the slot.  The heap itself is an
+    array of slots where the slot at position i has children at positions
+    2*i+1 and 2*i+2, along with a reverse array mapping each slot to its
+    position.  Sifting only moves integers between arrays and no per element
+    objects are kept by the storage.
+
+    Keys are always compared by their natural order so a custom comparator is
+    not supported.  To change the ordering use a key function instead (eg
+    ``key = lambda x: -x`` for a max heap).
+    """
+    def __init__(self, cmpfunc = cmp, keyfunc = None, typecode = "d"):
+        """
+        **Keyword Arguments**
+            typecode    -   The array typecode of the keys.  Defaults to "d" (double),
+                            "l" can be used for integer keys.
+        """
+        self._typecode = typecode
+        super(Storage, self).__init__(cmpfunc, keyfunc)
+        self.clear()
+
+    def clear(self):
+        """Removes all elements from the heap."""
+        self._keys = array(self._typecode)
+        self._values = []
+        self._positions = array("l")
+        self._heap = array("l")
+        self._free_slots = []
+        # The number of times each slot has been released
+        self._generations = array("l")
+
+    def top(self):
+        """
+        Returns a handle to the top value.
+        """
+        return Handle(self, self._heap[0])
+
+    def all_handles(self):
+        keys = self._keys
+        slots = sorted(self._heap, key = keys.__getitem__)
+        return [Handle(self, slot) for slot in slots]
+
+    def __nonzero__(self):
+        return len(self._heap) > 0
+
+    def __len__(self):
+        """
+        Returns the number of elements in the heap.
+        """
+        return len(self._heap)
+
+    def push(self, value):
+        """
+        Pushes a new value onto this heap storage and returns a Handle
+        to the slot in question.
+        """
+        key = self._keyof(value)
+        pos = len(self._heap)
+        if self._free_slots:
+            slot = self._free_slots.pop()
+            self._keys[slot] = key
+            self._values[slot] = value
+            self._positions[slot] = pos
+        else:
+            slot = len(self._values)
+            self._keys.append(key)
+            self._values.append(value)
+            self._positions.append(pos)
+            self._generations.append(0)
+        self._heap.append(slot)
+        self._upheap(pos)
+        return Handle(self, slot)
+
+    def heapify(self, values):
+        """
+        Adds a collection of values to the heap by rebuilding it bottom up
+        (Floyd's method) which takes O(n) comparisons instead of the
+        O(n log n) needed to push each value individually.
+        """
+        keys, heap, positions = self._keys, self._heap, self._positions
+        values = list(values)
+
+        # Reuse free slots first
+        nfree = min(len(self._free_slots), len(values))
+        slots = [self._free_slots.pop() for i in xrange(nfree)]
+        for slot,value in zip(slots, values):
+            keys[slot] = self._keyof(value)
+            self._values[slot] = value
+            positions[slot] = len(heap)
+            heap.append(slot)
+
+        # And append the rest in bulk
+        rest = values[nfree:]
+        first_slot, first_pos = len(self._values), len(heap)
+        if self._keyfunc is None:
+            keys.extend(rest)
+        else:
+            keys.extend(map(self._keyfunc, rest))
+        self._values.extend(rest)
+        positions.extend(xrange(first_pos, first_pos + len(rest)))
+        self._generations.extend([0] * len(rest))
+        heap.extend(xrange(first_slot, first_slot + len(rest)))
+        slots.extend(xrange(first_slot, first_slot + len(rest)))
+
+        for pos in xrange((len(heap) / 2) - 1, -1, -1):
+            self._downheap(pos)
+        return [Handle(self, slot) for slot in slots]
+
+    _rebuildable = True
+
+    # The elements of the heap are slots
+    def _elements(self):
+        return self._heap.tolist()
+
+    def _element(self, handle):
+        return handle.slot
+
+    def _rebuild(self, slots):
+        """
+        Rebuilds the heap bottom up (Floyd's method) from a list of slots.
+        """
+        self._reset(slots)
+        for pos in xrange((len(self._heap) / 2) - 1, -1, -1):
+            self._downheap(pos)
+
+    def _reset(self, slots):
+        self._heap = array("l", slots)
+        positions = self._positions
+        for pos,slot in enumerate(slots):
+            positions[slot] = pos
+
+    def _release(self, handles):
+        return map(self._release_slot, handles)
+
+    def snapshot(self):
+        """
+        Returns handles to the values in the order of the heap, which is laid
+        out as a contiguous binary heap.
+        """
+        return [Handle(self, slot) for slot in self._heap], ("dary", 2)
+
+    def restore(self, values, keys, layout):
+        """
+        Restores a snapshot of a contiguous binary heap (or a sorted one) by
+        giving each value the slot of its position in the heap, without any
+        comparisons.
+        """
+        if layout is not None and layout != ("dary", 2):
+            return super(Storage, self).restore(values, keys, layout)
+        self.clear()
+        self._values = list(values)
+        self._keys = array(self._typecode, keys)
+        self._positions = array("l", xrange(len(self._values)))
+        self._heap = array("l", xrange(len(self._values)))
+        self._generations = array("l", [0]) * len(self._values)
+        return [Handle(self, slot) for slot in xrange(len(self._values))]
+
+    def pop(self):
+        """
+        Pops the top value and returns a handle to it.
+        """
+        heap = self._heap
+        slot = heap[0]
+        last = heap.pop()
+        if heap:
+            # The last value can only move down from the top
+            heap[0] = last
+            self._positions[last] = 0
+            self._downheap(0)
+        return self._release_slot(Handle(self, slot))
+
+    def adjust(self, handle):
+        """
+        Called when the value pointed by the handle has been updated so its
+        key is recomputed and a possible reheaping is required.
+        """
+        slot = handle.slot
+        self._keys[slot] = self._keyof(self._values[slot])
+        pos = self._positions[slot]
+        if self._upheap(pos) == pos:
+            self._downheap(pos)
+        return handle
+
+    def remove(self, handle):
+        """
+        Removes the value referenced by the handle from the heap.  The last
+        element in the heap takes its place and is sifted to its correct
+        position.
+        """
+        slot = handle.slot
+        heap = self._heap
+        pos = self._positions[slot]
+        last = heap.pop()
+        if last != slot:
+            heap[pos] = last
+            self._positions[last] = pos
+            if self._upheap(pos) == pos:
+                self._downheap(pos)
+
+        return self._release_slot(handle)
+
+    def _release_slot(self, handle):
+        # Detach the handle so its value and key are still available after the slot is reused
+        slot = handle.slot
+        handle._key = self._keys[slot]
+        handle._storage = None
+        self._generations[slot] += 1
+        self._values[slot] = None
+        self._positions[slot] = -1
+        self._free_slots.append(slot)
+        return handle
+
+    def _comparator_changed(self):
+        if self._cmpfunc is not cmp:
+            raise ValueError("arrayheap.Storage only orders keys by their natural order.  Use a key function instead of a comparator.")
+        values = [self._values[slot] for slot in self._heap]
+        self.clear()
+        for value in values:
+            self.push(value)
+
+    def _upheap(self, pos):
+        heap, keys, positions = self._heap, self._keys, self._positions
+        slot = heap[pos]
+        key = keys[slot]
+        while pos > 0:
+            parent = (pos - 1) >> 1
+            parent_slot = heap[parent]
+            if keys[parent_slot] <= key:
+                break
+            heap[pos] = parent_slot
+            positions[parent_slot] = pos
+            pos = parent
+        heap[pos] = slot
+        positions[slot] = pos
+        return pos
+
+    def _downheap(self, pos):
+        heap, keys, positions = self._heap, self._keys, self._positions
+        size = len(heap)
+        slot = heap[pos]
+        key = keys[slot]
+        child = 2 * pos + 1
+        while child < size:
+            right = child + 1
+            if right < size and keys[heap[right]] < keys[heap[child]]:
+                child = right
+            child_slot = heap[child]
+            if key <= keys[child_slot]:
+                break
+            heap[pos] = child_slot
+            positions[child_slot] = pos
+            pos = child
+            child = 2 * pos + 1
+        heap[pos] = slot
+        positions[slot] = pos
+        return pos
@@ -6,24 +6,40 @@ class Handle(object):
     queues/heaps would inherit from this and return these handle values
     which can also be passed back to a queue.
     """
-    def __init__(self, value):
+    def __init__(self, value, key = None):
         self._value = value
+        self.key = key
 
     @property
     def value(self): 
         """Returns the value pointed by the handle."""
         return self._value
 
+    # key -   The priority of the value as cached by the storage.  This is the
+    #         result of the storage's key function at the time the value was
+    #         pushed or last adjusted, or the value itself if no key function
+    #         is used.
+
 class Storage(object):
     """Base class of all storage strategies that can back a priority queue.
 
         **Implementations**
 
+        ``priorityq.storage.listheap.Storage``
         ``priorityq.storage.binheap.Storage``
-        ``priorityq.storage.binaryheap.Storage``
+        ``priorityq.storage.arrayheap.Storage``
+        ``priorityq.storage.pairingheap.Storage``
+        ``priorityq.storage.binomialheap.Storage``
+        ``priorityq.storage.fibheap.Storage``
+        ``priorityq.storage.daryheap.Storage``
+        ``priorityq.storage.radixheap.Storage``
+        ``priorityq.storage.compactheap.Storage``
+        ``priorityq.storage.timerwheel.Storage``
+        ``priorityq.storage.external.Storage``
     """
-    def __init__(self, cmpfunc = cmp):
+    def __init__(self, cmpfunc = cmp, keyfunc = None):
         self._cmpfunc = cmpfunc
+        self._keyfunc = keyfunc
 
     def clear(self):
         """Removes all elements from the heap."""
@@ -60,6 +76,82 @@ class Storage(object):
         """Remove a value that is referenced by a particular handle from the heap."""
         pass
 
+    def pop_many(self, count):
+        """Pops upto count values from the top of the heap.
+
+        By default the values are popped in turn.  Array based storages (see ``_rebuildable``)
+        sort their values once instead when at least half of them are popped, as the values
+        that are left (being sorted) form a valid heap as is.
+
+        **Parameters**
+
+        count   -   The maximum number of values to pop.
+
+        **Returns**
+
+        A list of handles to the popped values in the order they were popped.
+        """
+        if not self._rebuildable or count * 2 < len(self):
+            return [self.pop() for i in xrange(min(count, len(self)))]
+        handles = self.all_handles()
+        self._reset(map(self._element, handles[count:]))
+        return self._release(handles[:count])
+
+    def adjust_many(self, handles):
+        """Called when the values pointed by a collection of handles have been updated.
+
+        Each handle is adjusted in turn.  An adjust usually moves a value only a few levels
+        so rebuilding the heap is not cheaper even for large batches.
+
+        **Returns**
+
+        A list of the handles.
+        """
+        return [self.adjust(h) or h for h in handles]
+
+    def remove_many(self, handles):
+        """Removes the values referenced by a collection of handles from the heap.
+
+        By default each handle is removed in turn.  Array based storages (see ``_rebuildable``)
+        drop all of them and rebuild the heap once instead when about a third of the heap or
+        more is removed, as a sift usually moves a value only a few levels.
+
+        **Returns**
+
+        A list of the handles.
+        """
+        handles = list(handles)
+        if not self._rebuildable or len(handles) * 3 <= len(self):
+            return [self.remove(h) or h for h in handles]
+        removed = set(map(self._element, handles))
+        self._rebuild([e for e in self._elements() if e not in removed])
+        return self._release(handles)
+
+    # Array based storages that can be rebuilt from a list of the elements of their array set
+    # this and implement _elements, _reset and _rebuild (and _element and _release if needed)
+    # so that large batches are popped and removed in one pass.
+    _rebuildable = False
+
+    def _elements(self):
+        """Returns the elements of the heap's array in order, skipping any empty ones."""
+        raise NotImplementedError
+
+    def _element(self, handle):
+        """Returns the element of the heap's array that a handle refers to.  By default the handle itself."""
+        return handle
+
+    def _reset(self, elements):
+        """Makes a list of elements that is already in heap order the contents of the heap."""
+        raise NotImplementedError
+
+    def _rebuild(self, elements):
+        """Rebuilds the heap from a list of elements in any order."""
+        raise NotImplementedError
+
+    def _release(self, handles):
+        """Called with the handles dropped from the heap by _reset or _rebuild.  Returns them."""
+        return handles
+
     def heapify(self, values):
         """Heapifies a collection of values onto this heap.
 
@@ -73,6 +165,57 @@ class Storage(object):
         """
         return map(self.push, values)
 
+    def merge(self, another):
+        """Melds all the values of another storage into this one leaving the other storage empty.
+
+        Handles to values in the other storage remain valid and refer to the same values in this storage.
+
+        **Parameters**
+
+        another -   The storage whose values are to be moved into this storage.
+
+        **Returns**
+
+        True if the storages were melded.  Storages that cannot be melded (by default, or when the other 
+        storage is of a different kind or ordered differently) return False and are left untouched.
+        """
+        return False
+
+    def snapshot(self):
+        """Returns the handles of all the values in the heap along with their layout.
+
+        The layout is a picklable description of where the handles are in the heap.  Along
+        with the values and keys of the handles (in the same order) it is all that ``restore``
+        needs to rebuild the heap.  By default the handles are in sorted order and the layout
+        is None.  Array based storages return the handles in the order of their array so that
+        the heap can be restored without comparing any values.
+
+        **Returns**
+
+        A tuple of the list of handles and the layout.
+        """
+        return self.all_handles(), None
+
+    def restore(self, values, keys, layout):
+        """Replaces the contents of the heap with the values of a snapshot.
+
+        A layout that is understood by the storage (or None, as sorted values form a valid
+        heap) is restored as is without comparing the values or calling the key function.
+        By default the values are heapified.
+
+        **Parameters**
+
+        values  -   The values of the handles returned by ``snapshot``.
+        keys    -   The keys of the handles returned by ``snapshot``.
+        layout  -   The layout returned by ``snapshot``.
+
+        **Returns**
+
+        A list of handles to the values in the same order as the values.
+        """
+        self.clear()
+        return self.heapify(values)
+
     def __len__(self):
         """Returns the number of elements in the heap."""
         return 0
@@ -82,7 +225,11 @@ class Storage(object):
 
     @property
     def comparator(self):
-        """Returns the comparator currently used to prioritize the elements in this heap."""
+        """Returns the comparator currently used to prioritize the elements in this heap.
+
+        The comparator is invoked on the keys of two elements (see ``key``)
+        which are the values themselves unless a key function is set.
+        """
         return self._cmpfunc
 
     @comparator.setter
@@ -91,6 +238,28 @@ class Storage(object):
         self._cmpfunc = cmpfunc
         self._comparator_changed()
 
+    @property
+    def key(self):
+        """Returns the key function used to compute the priority of a value or None if values are compared directly."""
+        return self._keyfunc
+
+    @key.setter
+    def key(self, keyfunc):
+        """Setter for the key function."""
+        self._keyfunc = keyfunc
+        self._comparator_changed()
+
+    def _keyof(self, value):
+        """Returns the key by which a value is prioritized.
+
+        Keys are computed once when a value is pushed or adjusted and cached in
+        its handle so that comparisons within the heap do not call back into
+        the key function.
+        """
+        if self._keyfunc is None:
+            return value
+        return self._keyfunc(value)
+
     def _comparator_changed(self):
         """Method invoked when the comparator has been modified and values in the heap need to be reprioritized.  Default behaviour is to simply make a copy of all the values, clear the heap and re-insert them"""
         handles = self.all_handles()
@@ -1,10 +1,14 @@
 
+from itertools import izip
 from base import Handle as BaseHandle
 from base import Storage as BaseStorage
 
 class Handle(BaseHandle):
-    def __init__(self, value, index):
-        super(Handle, self).__init__(value)
+    # Set on handles that have been lazily removed from the heap
+    removed = False
+
+    def __init__(self, value, key, index):
+        super(Handle, self).__init__(value, key)
         self.index = index
 
     def __repr__(self): return str(self)
@@ -15,27 +19,44 @@ class Storage(BaseStorage):
     """
     A heap implemented as an array of elements where a node at index 
     i has children at indexes 2*i+1 and 2*i+2
+
+    Removals can optionally be lazy.  A lazily removed handle is only marked
+    as removed (in O(1)) and is left in the heap till it reaches the top where
+    it is discarded by a pop (or a call to top).  Once the removed handles
+    exceed a given fraction of the heap, the heap is compacted by rebuilding
+    it with only the live handles.  Removals are only lazy when a key function
+    is set.  Without one the key of a handle is the value itself, which the
+    caller may still modify once it has been removed and so cannot be left in
+    the heap.
     """
-    def __init__(self, cmpfunc = cmp):
-        super(Storage, self).__init__(cmpfunc)
-        self._empty_indexes = []
-        self._handles = []
-        self._count = 0
+    def __init__(self, cmpfunc = cmp, keyfunc = None, lazy_removal_ratio = None):
+        """
+        **Keyword Arguments**
+            lazy_removal_ratio  -   If set (along with a key function), removals are lazy and the
+                                    heap is compacted when the fraction of removed handles in it
+                                    exceeds this ratio.  Default: None (removals are not lazy)
+        """
+        super(Storage, self).__init__(cmpfunc, keyfunc)
+        self._lazy_removal_ratio = lazy_removal_ratio
+        self.clear()
 
     def top(self):
         """
         Returns a handle to the top value.
         """
+        self._discard_removed()
         return self._handles[0]
 
     def clear(self):
         """Removes all elements from the heap."""
         self._count = 0
+        self._removed_count = 0
+        self._empty_indexes = []
         self._handles = []
 
     def all_handles(self):
-        out = [h for h in self._handles if h]
-        out.sort(cmp = lambda x,y: self._cmpfunc(x.value, y.value))
+        out = [h for h in self._handles if h and not h.removed]
+        out.sort(cmp = lambda x,y: self._cmpfunc(x.key, y.key))
         return out
 
     def __nonzero__(self):
@@ -52,7 +73,7 @@ class Storage(BaseStorage):
         Pushes a new value onto this heap storage and returns a Handle
         to the node in question.
         """
-        handle = Handle(value, self._count)
+        handle = Handle(value, self._keyof(value), len(self._handles))
         self._count += 1
         if self._empty_indexes:
             i = self._empty_indexes.pop()
@@ -63,7 +84,7 @@ class Storage(BaseStorage):
             self._handles.append(handle)
 
             # And extend with more empty space at the end so we can ammortize push speeds
-            newlen = self._count
+            newlen = len(self._handles)
             newcapacity = ((newlen * 3) / 2)
             spare = max(8, newcapacity - newlen)
             nones = [None] * spare
@@ -78,55 +99,121 @@ class Storage(BaseStorage):
         """
         Pops the top value and returns the value held by the last top value.
         """
-        return self.remove(self._handles[0])
+        self._discard_removed()
+        handle = self._handles[0]
+        self._sift_out(handle)
+        self._count -= 1
+        return handle
 
     def adjust(self, handle):
         """
         Called when the value pointed by the handle has been updated so a 
         possible reheaping is required.
         """
+        handle.key = self._keyof(handle.value)
+
         # Try moving it up heap if required
         curr = handle.index
         if self._upheap(curr) == curr:
             # nothing happened, then try down heaping it
-            size = len(self._handles)
-            curr = handle.index
-            while curr < size:
-                left = 2 * curr + 1
-                right = 2 * curr + 2
-                leftPtr = None if left >= size else self._handles[left]
-                rightPtr = None if right >= size else self._handles[right]
-                if not leftPtr and not rightPtr: 
-                    # we are in the right spot
-                    return
-
-                smaller = -1
-                if not leftPtr and rightPtr:
-                    smaller = right
-                elif not rightPtr and leftPtr:
-                    smaller = left 
-                elif self._cmpfunc(leftPtr.value, rightPtr.value) < 0:
-                    smaller = left
-                else:
-                    smaller = right
-
-                # See we are smaller than the "smaller" child, if not, swap with it
-                if self._cmpfunc(handle.value, self._handles[smaller].value) < 0:
-                    # We are smaller than the smaller child so we are in right spot
-                    return
-
-                # otherwise swap
-                self._handles[curr] = self._handles[smaller]
-                self._handles[curr].index = curr
-                self._handles[smaller] = handle
-                self._handles[smaller].index = smaller
-                curr = smaller
-            return handle
-        
+            self._downheap(curr)
+        return handle
+
+    def heapify(self, values):
+        """
+        Adds a collection of values to the heap by rebuilding it bottom up
+        (Floyd's method) which takes O(n) comparisons instead of the
+        O(n log n) needed to push each value individually.  The rebuilt
+        heap is compacted so that it has no empty slots.
+        """
+        new_handles = [Handle(value, self._keyof(value), 0) for value in values]
+        handles = [h for h in self._handles if h and not h.removed]
+        handles.extend(new_handles)
+        self._rebuild(handles)
+        return new_handles
+
+    def snapshot(self):
+        """
+        Returns the handles in the order of the array.  The layout records
+        the size of the array and its empty slots.  Lazily removed handles are
+        compacted away first.
+        """
+        if self._removed_count:
+            self._rebuild([h for h in self._handles if h and not h.removed])
+        return [h for h in self._handles if h], ("binheap", len(self._handles), self._empty_indexes[:])
+
+    def restore(self, values, keys, layout):
+        """
+        Restores a snapshot of a binheap (or a sorted or contiguous binary
+        heap) into the same slots of the array without any comparisons.
+        """
+        if layout is None or layout == ("dary", 2):
+            size, empty_indexes = len(values), []
+        elif layout[0] == "binheap":
+            size, empty_indexes = layout[1], layout[2]
+        else:
+            return super(Storage, self).restore(values, keys, layout)
+        self.clear()
+        if empty_indexes:
+            empty = set(empty_indexes)
+            indexes = [i for i in xrange(size) if i not in empty]
+        else:
+            indexes = xrange(size)
+        handles = [Handle(value, key, index) for index,value,key in izip(indexes, values, keys)]
+        self._handles = [None] * size
+        for handle in handles:
+            self._handles[handle.index] = handle
+        self._empty_indexes = list(empty_indexes)
+        self._count = len(handles)
+        return handles
+
     def remove(self, handle):
         """
         Removes the node referenced by the handle from the heap.
         """
+        self._count -= 1
+        if self._lazy_removal_ratio is None or self._keyfunc is None:
+            self._sift_out(handle)
+        else:
+            handle.removed = True
+            self._removed_count += 1
+            if self._removed_count > self._lazy_removal_ratio * (self._count + self._removed_count):
+                self._rebuild([h for h in self._handles if h and not h.removed])
+        return handle
+
+    _rebuildable = True
+
+    def _elements(self):
+        return [h for h in self._handles if h and not h.removed]
+
+    def _rebuild(self, handles):
+        """
+        Rebuilds the heap bottom up (Floyd's method) from a list of handles.
+        """
+        self._reset(handles)
+        for index in xrange((self._count / 2) - 1, -1, -1):
+            self._downheap(index)
+
+    def _reset(self, handles):
+        for index,handle in enumerate(handles):
+            handle.index = index
+        self._handles = handles
+        self._empty_indexes = []
+        self._count = len(handles)
+        self._removed_count = 0
+
+    def _discard_removed(self):
+        """
+        Discards lazily removed handles from the top of the heap.
+        """
+        while self._removed_count and self._handles[0].removed:
+            self._sift_out(self._handles[0])
+            self._removed_count -= 1
+
+    def _sift_out(self, handle):
+        """
+        Moves the node referenced by the handle down to a leaf and removes it.
+        """
         size = len(self._handles)
         curr = handle.index
         while curr < size:
@@ -142,7 +229,7 @@ class Storage(BaseStorage):
             elif not leftPtr and not rightPtr:
                 break
             else:
-                if self._cmpfunc(leftPtr.value, rightPtr.value) < 0:
+                if self._cmpfunc(leftPtr.key, rightPtr.key) < 0:
                     which = left
                 else:
                     which = right
@@ -151,7 +238,6 @@ class Storage(BaseStorage):
             self._handles[which] = handle
             self._handles[which].index = which
             curr = which
-        self._count -= 1
         self._handles[handle.index] = None
         self._release_index(handle.index)
         return handle
@@ -169,6 +255,45 @@ class Storage(BaseStorage):
                 hi = mid - 1
         A.insert(lo, index)
 
+    def _downheap(self, curr):
+        """
+        Moves the value at the given index down the heap till it is smaller
+        than both its children and returns its final index.
+        """
+        handle = self._handles[curr]
+        size = len(self._handles)
+        while curr < size:
+            left = 2 * curr + 1
+            right = 2 * curr + 2
+            leftPtr = None if left >= size else self._handles[left]
+            rightPtr = None if right >= size else self._handles[right]
+            if not leftPtr and not rightPtr: 
+                # we are in the right spot
+                break
+
+            smaller = -1
+            if not leftPtr and rightPtr:
+                smaller = right
+            elif not rightPtr and leftPtr:
+                smaller = left 
+            elif self._cmpfunc(leftPtr.key, rightPtr.key) < 0:
+                smaller = left
+            else:
+                smaller = right
+
+            # See we are smaller than the "smaller" child, if not, swap with it
+            if self._cmpfunc(handle.key, self._handles[smaller].key) < 0:
+                # We are smaller than the smaller child so we are in right spot
+                break
+
+            # otherwise swap
+            self._handles[curr] = self._handles[smaller]
+            self._handles[curr].index = curr
+            self._handles[smaller] = handle
+            self._handles[smaller].index = smaller
+            curr = smaller
+        return curr
+
     def _upheap(self, curr):
         start = curr
         parent_is_empty = False
@@ -177,7 +302,7 @@ class Storage(BaseStorage):
             parent_handle = self._handles[parent]
             parent_is_empty = parent_handle is None
             if parent_handle:
-                if self._cmpfunc(parent_handle.value,self._handles[curr].value) <= 0:
+                if self._cmpfunc(parent_handle.key,self._handles[curr].key) <= 0:
                     break
                 parent_handle.index = curr
 
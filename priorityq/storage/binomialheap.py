@@ -2,9 +2,24 @@
 from base import Handle as BaseHandle
 from base import Storage as BaseStorage
 
-class Node(BaseHandle):
-    def __init__(self, value, degree = 0):
-        super(Node, self).__init__(value)
+class Handle(BaseHandle):
+    def __init__(self, value, key, node = None):
+        super(Handle, self).__init__(value, key)
+        self.node = node
+
+    def __repr__(self): return str(self)
+    def __str__(self):
+        return "<Ptr (0x%x), Value: %s>" % (id(self), str(self.value))
+
+class Node(object):
+    """
+    A node in a binomial tree.  Nodes are kept seperate from the handles they
+    hold so that values can be moved up and down a tree (by swapping handles
+    between nodes) without invalidating any handles.
+    """
+    def __init__(self, handle, degree = 0):
+        self.handle = handle
+        handle.node = self
         self.degree = degree
         self.parent = None
         self.next = None
@@ -20,11 +35,14 @@ class Node(BaseHandle):
 
 class Storage(BaseStorage):
     """
-    A heap implemented as an array of elements where a node at index 
-    i has children at indexes 2*i+1 and 2*i+2
+    A binomial heap stored as a list of binomial trees where the tree at
+    index i (if any) is of degree i.
+
+    Pushes are O(1) amortized, pops, adjustments and removals are O(log n)
+    and two binomial heaps can be merged in O(log n).
     """
-    def __init__(self, cmpfunc = cmp):
-        super(Storage, self).__init__(cmpfunc)
+    def __init__(self, cmpfunc = cmp, keyfunc = None):
+        super(Storage, self).__init__(cmpfunc, keyfunc)
         self.clear()
 
     def __nonzero__(self):
@@ -39,61 +57,142 @@ class Storage(BaseStorage):
     def clear(self):
         """Removes all elements from the heap."""
         self._count = 0
-        self._roots = None
+        self._roots = []
 
     def all_handles(self):
         """Returns an iterator over all the values in the heap."""
         out = []
-        for root in self._roots:
-            stack = [root]
-            while stack:
-                next = stack.pop()
-                out.append(next)
-                for child in next.children:
-                    stack.append(child)
-        out.sort(cmp = lambda x,y: self._cmpfunc(x.value, y.value))
+        stack = [root for root in self._roots if root]
+        while stack:
+            next = stack.pop()
+            out.append(next.handle)
+            stack.extend(next.children)
+        out.sort(cmp = lambda x,y: self._cmpfunc(x.key, y.key))
         return out
 
     def push(self, value):
         """Pushes a new value onto the heap."""
-        newnode = Node(value)
-        self._push_node(newnode)
-        return newnode
-
-    def _push_node(self, node):
-        if not self._roots:
-            self._root = [node]
-        else:
+        handle = Handle(value, self._keyof(value))
+        self._push_node(Node(handle))
+        self._count += 1
+        return handle
 
-    @property
     def top(self):
         """Returns a handle to the top value on the heap."""
-        return None
+        return self._roots[self._min_root_index()].handle
 
     def pop(self):
         """Pops the top value from the stack and returns a handle to it."""
-        return None
+        handle = self._roots[self._min_root_index()].handle
+        self._remove_root(handle.node)
+        self._count -= 1
+        return handle
 
-    def find(self, value):
-        """Returns a handle to the given value in the heap. """
-        return None
+    def adjust(self, handle):
+        """
+        Called when the value pointed by the handle has been updated so a
+        possible reheaping is required.
+        """
+        handle.key = self._keyof(handle.value)
+        node = self._upheap(handle.node)
+        for child in node.children:
+            if self._cmpfunc(child.handle.key, handle.key) < 0:
+                # Value has to go further down the tree so remove and reinsert it
+                self._remove_root(self._upheap(node, True))
+                self._push_node(Node(handle))
+                break
+        return handle
 
     def remove(self, handle):
         """Remove a value that is referenced by a particular handle from the heap."""
-        pass
-
-    def _merge(self, node1, node):
-        diff = self._cmpfunc(node1.value, node2.value)
-        if node1.degree == node2.degree:
-            if diff <= 0:
-                self._add_child(node1, node2)
-            else:
-                self._add_child(node2, node1)
-        elif node1.degree < node2.degree:
-            pass
-        else:
+        self._remove_root(self._upheap(handle.node, True))
+        self._count -= 1
+        return handle
 
-    def _add_child(self, parent, child):
-        # if we already have a child with the same degree, 
-        # then merge with that one!
+    def merge(self, another):
+        """
+        Melds another binomial heap into this one in O(log n).
+        """
+        if type(another) is not type(self) or \
+                another._cmpfunc is not self._cmpfunc or \
+                another._keyfunc is not self._keyfunc:
+            return False
+        for root in another._roots:
+            if root: self._push_node(root)
+        self._count += another._count
+        another.clear()
+        return True
+
+    def _min_root_index(self):
+        index = -1
+        for i,root in enumerate(self._roots):
+            if root and (index < 0 or self._cmpfunc(root.handle.key, self._roots[index].handle.key) < 0):
+                index = i
+        if index < 0:
+            raise IndexError("top of empty heap")
+        return index
+
+    def _push_node(self, node):
+        """
+        Adds a binomial tree to the list of roots merging it with the existing
+        roots of the same degree (much like a carry in binary addition).
+        """
+        roots = self._roots
+        degree = node.degree
+        while degree < len(roots) and roots[degree]:
+            node = self._merge(roots[degree], node)
+            roots[degree] = None
+            degree += 1
+        if degree >= len(roots):
+            roots.extend([None] * (degree + 1 - len(roots)))
+        roots[degree] = node
+
+    def _remove_root(self, root):
+        """
+        Removes a root from the heap and adds its children back as roots.
+        """
+        roots = self._roots
+        roots[root.degree] = None
+        while roots and roots[-1] is None:
+            roots.pop()
+        child = root.child_head
+        while child:
+            next = child.next
+            child.parent = child.next = None
+            self._push_node(child)
+            child = next
+        root.child_head = None
+
+    def _upheap(self, node, to_root = False):
+        """
+        Moves the handle held by the node up the tree, by swapping it with the
+        handles of its parents, till it is no smaller than its parent (or till
+        it reaches the root if to_root is True).  Returns the node which holds
+        the handle at the end.
+        """
+        handle = node.handle
+        parent = node.parent
+        while parent and (to_root or self._cmpfunc(handle.key, parent.handle.key) < 0):
+            node.handle = parent.handle
+            node.handle.node = node
+            node = parent
+            parent = node.parent
+        node.handle = handle
+        handle.node = node
+        return node
+
+    def _merge(self, node1, node2):
+        """
+        Merges two trees of the same degree by making the one with the larger
+        root a child of the other.
+        """
+        if self._cmpfunc(node2.handle.key, node1.handle.key) < 0:
+            node1, node2 = node2, node1
+        self._add_child(node1, node2)
+        return node1
 
+    def _add_child(self, parent, child):
+        child.parent = parent
+        child.next = parent.child_head
+        parent.child_head = child
+        parent.degree += 1
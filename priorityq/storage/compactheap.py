@@ -0,0 +1,57 @@
+
+import daryheap
+from daryheap import Handle
+
+class Storage(daryheap.Storage):
+    """
+    A binary heap that is always kept contiguous.
+
+    Unlike ``binheap.Storage`` there are no empty slots in the array and no
+    free list to maintain.  A removal moves the last element into the slot of
+    the removed one and sifts it up or down, so the array never holds more
+    than the live elements and the tree is never deeper than log n.  This is
+    the 2-ary case of ``daryheap.Storage`` with sifts specialised for two
+    children.
+    """
+    def __init__(self, cmpfunc = cmp, keyfunc = None):
+        super(Storage, self).__init__(cmpfunc, keyfunc, arity = 2)
+
+    def _upheap(self, curr):
+        handles = self._handles
+        cmpfunc = self._cmpfunc
+        handle = handles[curr]
+        key = handle.key
+        while curr > 0:
+            parent = (curr - 1) >> 1
+            parent_handle = handles[parent]
+            if cmpfunc(parent_handle.key, key) <= 0:
+                break
+            handles[curr] = parent_handle
+            parent_handle.index = curr
+            curr = parent
+        handles[curr] = handle
+        handle.index = curr
+        return curr
+
+    def _downheap(self, curr):
+        handles = self._handles
+        cmpfunc = self._cmpfunc
+        size = len(handles)
+        handle = handles[curr]
+        key = handle.key
+        child = 2 * curr + 1
+        while child < size:
+            child_handle = handles[child]
+            right = child + 1
+            if right < size and cmpfunc(handles[right].key, child_handle.key) < 0:
+                child = right
+                child_handle = handles[right]
+            if cmpfunc(key, child_handle.key) <= 0:
+                break
+            handles[curr] = child_handle
+            child_handle.index = curr
+            curr = child
+            child = 2 * curr + 1
+        handles[curr] = handle
+        handle.index = curr
+        return curr
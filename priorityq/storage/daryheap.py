@@ -0,0 +1,202 @@
+
+from itertools import izip
+from base import Handle as BaseHandle
+from base import Storage as BaseStorage
+
+class Handle(BaseHandle):
+    def __init__(self, value, key, index):
+        super(Handle, self).__init__(value, key)
+        self.index = index
+
+    def __repr__(self): return str(self)
+    def __str__(self):
+        return "<Ptr (0x%x), Index: %d, Value: %s>" % (id(self), self.index, str(self.value))
+
+class Storage(BaseStorage):
+    """
+    A heap implemented as an array of elements where a node at index i has
+    children at indexes d*i+1 to d*i+d, d being the arity of the heap.
+
+    A wider heap is shallower so pushes and decreases (which move values up
+    the heap) touch fewer levels, while pops and increases (which move values
+    down the heap) compare more children per level.  The array is always kept
+    contiguous.
+    """
+    def __init__(self, cmpfunc = cmp, keyfunc = None, arity = 4):
+        """
+        **Keyword Arguments**
+            arity   -   The number of children of each node in the heap.  Default: 4
+        """
+        if arity < 2:
+            raise ValueError("Arity of a heap must be at least 2")
+        super(Storage, self).__init__(cmpfunc, keyfunc)
+        self.arity = arity
+        self._handles = []
+
+    def top(self):
+        """
+        Returns a handle to the top value.
+        """
+        return self._handles[0]
+
+    def clear(self):
+        """Removes all elements from the heap."""
+        self._handles = []
+
+    def all_handles(self):
+        out = self._handles[:]
+        out.sort(cmp = lambda x,y: self._cmpfunc(x.key, y.key))
+        return out
+
+    def __nonzero__(self):
+        return len(self._handles) > 0
+
+    def __len__(self):
+        """
+        Returns the number of elements in the heap.
+        """
+        return len(self._handles)
+
+    def push(self, value):
+        """
+        Pushes a new value onto this heap storage and returns a Handle
+        to the node in question.
+        """
+        handle = Handle(value, self._keyof(value), len(self._handles))
+        self._handles.append(handle)
+        self._upheap(handle.index)
+        return handle
+
+    def pop(self):
+        """
+        Pops the top value and returns a handle to it.
+        """
+        return self.remove(self._handles[0])
+
+    def adjust(self, handle):
+        """
+        Called when the value pointed by the handle has been updated so a
+        possible reheaping is required.
+        """
+        handle.key = self._keyof(handle.value)
+        curr = handle.index
+        if self._upheap(curr) == curr:
+            self._downheap(curr)
+        return handle
+
+    def remove(self, handle):
+        """
+        Removes the node referenced by the handle from the heap.  The last
+        element in the heap takes its place and is sifted to its correct
+        position.
+        """
+        last = self._handles.pop()
+        if last is not handle:
+            curr = handle.index
+            self._handles[curr] = last
+            last.index = curr
+            if self._upheap(curr) == curr:
+                self._downheap(curr)
+        return handle
+
+    def heapify(self, values):
+        """
+        Adds a collection of values to the heap by rebuilding it bottom up.
+        """
+        handles = self._handles
+        new_handles = [Handle(value, self._keyof(value), len(handles) + i) for i,value in enumerate(values)]
+        handles.extend(new_handles)
+        for index in xrange(((len(handles) - 2) / self.arity), -1, -1):
+            self._downheap(index)
+        return new_handles
+
+    _rebuildable = True
+
+    def _elements(self):
+        return self._handles[:]
+
+    def _rebuild(self, handles):
+        """
+        Rebuilds the heap bottom up from a list of handles.
+        """
+        self._reset(handles)
+        for index in xrange(((len(handles) - 2) / self.arity), -1, -1):
+            self._downheap(index)
+
+    def _reset(self, handles):
+        for index,handle in enumerate(handles):
+            handle.index = index
+        self._handles = handles
+
+    def snapshot(self):
+        """
+        Returns the handles in the order of the array.  The layout records
+        the arity of the heap.
+        """
+        return self._handles[:], ("dary", self.arity)
+
+    def restore(self, values, keys, layout):
+        """
+        Restores a snapshot of a heap of the same arity (or a sorted one) as
+        the array without any comparisons.
+        """
+        if layout is not None and layout != ("dary", self.arity):
+            return super(Storage, self).restore(values, keys, layout)
+        self._handles = [Handle(value, key, index) for index,(value,key) in enumerate(izip(values, keys))]
+        return self._handles[:]
+
+    def _upheap(self, curr):
+        """
+        Moves the value at the given index up the heap till it is no smaller
+        than its parent and returns its final index.
+        """
+        handles = self._handles
+        cmpfunc = self._cmpfunc
+        arity = self.arity
+        handle = handles[curr]
+        key = handle.key
+        while curr > 0:
+            parent = (curr - 1) / arity
+            parent_handle = handles[parent]
+            if cmpfunc(parent_handle.key, key) <= 0:
+                break
+            handles[curr] = parent_handle
+            parent_handle.index = curr
+            curr = parent
+        handles[curr] = handle
+        handle.index = curr
+        return curr
+
+    def _downheap(self, curr):
+        """
+        Moves the value at the given index down the heap till it is no larger
+        than any of its children and returns its final index.
+        """
+        handles = self._handles
+        cmpfunc = self._cmpfunc
+        arity = self.arity
+        size = len(handles)
+        handle = handles[curr]
+        key = handle.key
+        while True:
+            first = arity * curr + 1
+            if first >= size:
+                break
+
+            # Find the smallest child
+            smallest = first
+            smallest_key = handles[first].key
+            for child in xrange(first + 1, min(first + arity, size)):
+                child_key = handles[child].key
+                if cmpfunc(child_key, smallest_key) < 0:
+                    smallest, smallest_key = child, child_key
+
+            if cmpfunc(key, smallest_key) <= 0:
+                break
+            smallest_handle = handles[smallest]
+            handles[curr] = smallest_handle
+            smallest_handle.index = curr
+            curr = smallest
+        handles[curr] = handle
+        handle.index = curr
+        return curr
@@ -0,0 +1,389 @@
+
+import os
+import atexit
+import shutil
+import weakref
+import tempfile
+import itertools
+import cPickle as pickle
+from base import Handle as BaseHandle
+from base import Storage as BaseStorage
+import compactheap
+
+class Handle(BaseHandle):
+    def __init__(self, value, key, serial):
+        super(Handle, self).__init__(value, key)
+        self.serial = serial
+        # Whether the value has been written to a run on disk
+        self.spilled = False
+        # The handle of the value in the in memory heap (if it is not spilled)
+        self.node = None
+        # The run the value was spilled to
+        self.run = None
+
+    def __repr__(self): return str(self)
+    def __str__(self):
+        return "<Ptr (0x%x), Serial: %d, Spilled: %s, Value: %s>" % (id(self), self.serial, self.spilled, str(self.value))
+
+class Storage(BaseStorage):
+    """
+    A heap that holds a bounded number of values in memory and spills the
+    rest to sorted run files on disk.
+
+    Values are pushed onto an in memory heap.  When it holds more than
+    buffer_size values the larger half of them is sorted and written out
+    sequentially as a run, so the values most likely to be popped next stay
+    in memory.  Pops take the smaller of the in memory top and the smallest
+    head of the runs, reading each run sequentially as it is drained (a lazy
+    k-way merge).  If there are more than max_runs runs they are merged into
+    a single run.
+
+    The storage only keeps references to the values in memory.  Handles to
+    spilled values stay valid as long as they are referenced elsewhere (eg by
+    a PQ) and the same handle is returned when the value is read back.
+    Removing a spilled value records its serial number so it is skipped when
+    read back, and adjusting one removes it and pushes it back into memory.
+    Keys and values must be picklable.
+
+    A PQ keeps a handle for every value it holds (to find, adjust and remove
+    values) so spilled values stay in memory along with their handles.  To
+    bound the memory used (eg for a crawl frontier that is only pushed onto
+    and popped from) use the storage directly without holding on to the
+    handles returned by push::
+
+        with external.Storage(keyfunc = priority, buffer_size = 100000) as frontier:
+            frontier.push(url)
+            ...
+            url = frontier.pop().value
+
+    Run files are deleted when the storage is closed (or exits a with block),
+    garbage collected or when the interpreter exits.
+    """
+    def __init__(self, cmpfunc = cmp, keyfunc = None, buffer_size = 100000, max_runs = 64, directory = None):
+        """
+        **Keyword Arguments**
+            buffer_size -   The number of values held in memory before spilling.  Default: 100000
+            max_runs    -   The number of runs after which all runs are merged into one.  Default: 64
+            directory   -   The directory run files are created in.  Default: a new temporary directory
+        """
+        if buffer_size < 2:
+            raise ValueError("buffer_size must be at least 2")
+        super(Storage, self).__init__(cmpfunc, keyfunc)
+        self.buffer_size = buffer_size
+        self.max_runs = max_runs
+        self._files = _RunFiles(self, directory)
+        self._serials = itertools.count()
+        self._runs = None
+        self.clear()
+
+    def clear(self):
+        """Removes all elements from the heap and deletes the run files."""
+        if self._runs:
+            for run in self._runs.all_handles():
+                run.value.close()
+        self._count = 0
+        self._memory = compactheap.Storage(self._cmpfunc, _handle_key)
+        self._runs = compactheap.Storage(self._cmpfunc, _run_key)
+        # Serial numbers of spilled values that have been removed
+        self._removed = set()
+        # Handles of spilled values that are still referenced elsewhere
+        self._spilled = weakref.WeakValueDictionary()
+
+    def close(self):
+        """Removes all elements and deletes the temporary directory if one was created."""
+        self.clear()
+        self._files.delete()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def all_handles(self):
+        out = [node.value for node in self._memory.all_handles()]
+        for run in self._runs.all_handles():
+            for key, serial, value in run.value.peek_all():
+                if serial not in self._removed:
+                    out.append(self._revive(key, serial, value, run.value))
+        out.sort(cmp = lambda x,y: self._cmpfunc(x.key, y.key))
+        return out
+
+    def __nonzero__(self):
+        return self._count > 0
+
+    def __len__(self):
+        """
+        Returns the number of elements in the heap.
+        """
+        return self._count
+
+    @property
+    def numruns(self):
+        """Returns the number of runs on disk."""
+        return len(self._runs)
+
+    def top(self):
+        """
+        Returns a handle to the top value.
+        """
+        run = self._top_run()
+        if run is not None:
+            key, serial, value = run.head
+            return self._revive(key, serial, value, run)
+        return self._memory.top().value
+
+    def push(self, value):
+        """
+        Pushes a new value onto this heap storage and returns a Handle
+        to the node in question.
+        """
+        handle = Handle(value, self._keyof(value), next(self._serials))
+        handle.node = self._memory.push(handle)
+        self._count += 1
+        if len(self._memory) > self.buffer_size:
+            self._spill()
+        return handle
+
+    def pop(self):
+        """
+        Pops the top value and returns a handle to it.
+        """
+        run = self._top_run()
+        if run is not None:
+            key, serial, value = run.head
+            handle = self._revive(key, serial, value, run)
+            del self._spilled[serial]
+            handle.spilled = False
+            handle.run = None
+            self._advance(run)
+        else:
+            handle = self._memory.pop().value
+            handle.node = None
+        self._count -= 1
+        return handle
+
+    def adjust(self, handle):
+        """
+        Called when the value pointed by the handle has been updated so a
+        possible reheaping is required.  A spilled value is moved back into
+        memory.
+        """
+        handle.key = self._keyof(handle.value)
+        if handle.spilled:
+            self._unspill(handle)
+            handle.serial = next(self._serials)
+            handle.node = self._memory.push(handle)
+            if len(self._memory) > self.buffer_size:
+                self._spill()
+        else:
+            self._memory.adjust(handle.node)
+        return handle
+
+    def remove(self, handle):
+        """
+        Removes the node referenced by the handle from the heap.
+        """
+        if handle.spilled:
+            self._unspill(handle)
+        else:
+            self._memory.remove(handle.node)
+            handle.node = None
+        self._count -= 1
+        return handle
+
+    def _revive(self, key, serial, value, run):
+        """
+        Returns the handle of a spilled value, creating one if the original
+        is no longer referenced.
+        """
+        handle = self._spilled.get(serial)
+        if handle is None:
+            handle = Handle(value, key, serial)
+            handle.spilled = True
+            handle.run = run
+            self._spilled[serial] = handle
+        return handle
+
+    def _unspill(self, handle):
+        """
+        Drops the spilled record of a value that is being removed or adjusted.
+        """
+        self._spilled.pop(handle.serial, None)
+        run = handle.run
+        if run.head[1] == handle.serial:
+            # Runs are ordered by their heads so a removed head is skipped right away
+            self._advance(run)
+        else:
+            self._removed.add(handle.serial)
+        handle.spilled = False
+        handle.run = None
+
+    def _top_run(self):
+        """
+        Returns the run whose head is the top value if it is smaller than the
+        in memory top.
+        """
+        if not self._runs:
+            return None
+        run = self._runs.top().value
+        if self._memory and self._cmpfunc(self._memory.top().key, run.head[0]) <= 0:
+            return None
+        return run
+
+    def _advance(self, run):
+        """
+        Moves a run to its next record that has not been removed.
+        """
+        removed = self._removed
+        while run.advance():
+            if run.head[1] not in removed:
+                self._runs.adjust(run.node)
+                return
+            removed.discard(run.head[1])
+        self._runs.remove(run.node)
+        run.close()
+
+    def _spill(self):
+        """
+        Writes the larger half of the in memory values to a new run.
+        """
+        handles = [node.value for node in self._memory.all_handles()]
+        keep = len(handles) / 2
+        self._memory.clear()
+        for handle in self._memory.heapify(handles[:keep]):
+            handle.value.node = handle
+
+        handles = handles[keep:]
+        for handle in handles:
+            handle.spilled = True
+            handle.node = None
+            self._spilled[handle.serial] = handle
+        run = self._add_run((h.key, h.serial, h.value) for h in handles)
+        for handle in handles:
+            handle.run = run
+        if len(self._runs) > self.max_runs:
+            self._merge_runs()
+
+    def _merge_runs(self):
+        """
+        Merges all the runs into one, dropping removed values.
+        """
+        runs = self._runs
+        def records():
+            while runs:
+                run = runs.top().value
+                yield run.head
+                self._advance(run)
+        run = self._add_run(records())
+        for handle in self._spilled.values():
+            handle.run = run
+
+    def _add_run(self, records):
+        fd, path = self._files.create()
+        with os.fdopen(fd, "wb") as outfile:
+            pickler = pickle.Pickler(outfile, pickle.HIGHEST_PROTOCOL)
+            for record in records:
+                pickler.dump(record)
+                # Records are not referenced by later ones
+                pickler.clear_memo()
+        run = _Run(path, self._files)
+        if not run.advance():
+            run.close()
+            return None
+        run.node = self._runs.push(run)
+        return run
+
+class _Run(object):
+    """
+    A sorted run of (key, serial, value) records read sequentially from a file.
+    """
+    def __init__(self, path, files):
+        self.path = path
+        self.files = files
+        self.file = open(path, "rb")
+        self.unpickler = pickle.Unpickler(self.file)
+        self.head = None
+        self.offset = 0
+        self.node = None
+
+    def advance(self):
+        """Reads the next record into head.  Returns False at the end of the run."""
+        self.offset = self.file.tell()
+        try:
+            self.head = self.unpickler.load()
+            return True
+        except EOFError:
+            self.head = None
+            return False
+
+    def peek_all(self):
+        """Returns an iterator over the records from the head till the end of the run."""
+        with open(self.path, "rb") as infile:
+            infile.seek(self.offset)
+            unpickler = pickle.Unpickler(infile)
+            while True:
+                try:
+                    yield unpickler.load()
+                except EOFError:
+                    break
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+            self.files.discard(self.path)
+
+class _RunFiles(object):
+    """
+    The run files of a storage and the temporary directory holding them (if
+    the storage created it).  They are deleted when the storage is closed,
+    garbage collected or when the interpreter exits.
+    """
+    def __init__(self, owner, directory):
+        self.directory = directory
+        self.owns_directory = directory is None
+        self.paths = set()
+        # Only a weak reference to the storage is held so it can still be collected
+        self._owner = weakref.ref(owner, lambda ref: self.delete())
+
+    def create(self):
+        """Creates a new run file and returns its descriptor and path."""
+        if self.directory is None:
+            self.directory = tempfile.mkdtemp(prefix = "priorityq-")
+        fd, path = tempfile.mkstemp(suffix = ".run", dir = self.directory)
+        self.paths.add(path)
+        _live_run_files.add(self)
+        return fd, path
+
+    def discard(self, path):
+        """Deletes a run file."""
+        self.paths.discard(path)
+        os.remove(path)
+
+    def delete(self):
+        """Deletes all the run files and the temporary directory."""
+        _live_run_files.discard(self)
+        for path in self.paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self.paths.clear()
+        if self.owns_directory and self.directory:
+            shutil.rmtree(self.directory, True)
+            self.directory = None
+
+# Run files of storages that have not been closed or collected yet
+_live_run_files = set()
+
+@atexit.register
+def _delete_run_files():
+    for files in list(_live_run_files):
+        files.delete()
+
+def _handle_key(handle):
+    return handle.key
+
+def _run_key(run):
+    return run.head[0]
@@ -0,0 +1,281 @@
+
+from base import Handle as BaseHandle
+from base import Storage as BaseStorage
+
+class Node(BaseHandle):
+    def __init__(self, value, key):
+        super(Node, self).__init__(value, key)
+        self.parent = None
+        self.child = None
+        # Siblings are kept in a circular doubly linked list
+        self.left = self
+        self.right = self
+        self.degree = 0
+        self.marked = False
+
+    @property
+    def children(self):
+        """Return an iterator over the children of a given node."""
+        child = self.child
+        if child:
+            curr = child
+            while True:
+                yield curr
+                curr = curr.right
+                if curr is child: break
+
+    def __repr__(self): return str(self)
+    def __str__(self):
+        return "<Node (0x%x), Value: %s>" % (id(self), str(self.value))
+
+class Storage(BaseStorage):
+    """
+    A Fibonacci heap where each node is a handle.
+
+    Pushes, melds and decreasing the key of a node are O(1) amortized while
+    pops and removals are O(log n) amortized.  A decreased node is cut from
+    its parent and any parents that have already lost a child are cut in turn
+    (cascading cuts).  An adjustment that moves a node further down the heap
+    removes and reinserts it.
+
+    As with the pairing heap, a key that has not decreased can only be told
+    apart from one that has when a key function is used.  Without one an
+    adjustment that does not break the order with its parent has to check
+    the children of the node.
+    """
+    def __init__(self, cmpfunc = cmp, keyfunc = None):
+        super(Storage, self).__init__(cmpfunc, keyfunc)
+        self.clear()
+
+    def __nonzero__(self):
+        return self._count > 0
+
+    def __len__(self):
+        """
+        Returns the number of elements in the heap.
+        """
+        return self._count
+
+    def clear(self):
+        """Removes all elements from the heap."""
+        self._count = 0
+        self._min = None
+
+    def all_handles(self):
+        out = []
+        stack = list(self._roots())
+        while stack:
+            node = stack.pop()
+            out.append(node)
+            stack.extend(node.children)
+        out.sort(cmp = lambda x,y: self._cmpfunc(x.key, y.key))
+        return out
+
+    def top(self):
+        """
+        Returns a handle to the top value.
+        """
+        return self._min
+
+    def push(self, value):
+        """
+        Pushes a new value onto this heap storage and returns a handle to it.
+        """
+        node = Node(value, self._keyof(value))
+        self._add_root(node)
+        self._count += 1
+        return node
+
+    def pop(self):
+        """
+        Pops the top value and returns a handle to it.
+        """
+        node = self._min
+        if node is None:
+            raise IndexError("pop from empty heap")
+        self._extract_root(node)
+        self._count -= 1
+        return node
+
+    def adjust(self, node):
+        """
+        Called when the value pointed by the handle has been updated so a
+        possible reheaping is required.
+        """
+        oldkey = node.key
+        node.key = self._keyof(node.value)
+        parent = node.parent
+        if parent and self._cmpfunc(node.key, parent.key) < 0:
+            # Decreased past its parent so cut it out
+            self._cut(node, parent)
+            self._cascading_cut(parent)
+        elif self._keyfunc is not None and self._cmpfunc(node.key, oldkey) <= 0:
+            # Decreased but still in order with its parent (and children)
+            if parent is None and self._cmpfunc(node.key, self._min.key) < 0:
+                self._min = node
+        elif node is self._min or \
+                any(self._cmpfunc(child.key, node.key) < 0 for child in node.children):
+            # Has to go further down (or may no longer be the minimum)
+            self._remove_node(node)
+            self._add_root(node)
+        elif parent is None and self._cmpfunc(node.key, self._min.key) < 0:
+            self._min = node
+        return node
+
+    def remove(self, node):
+        """
+        Removes the node referenced by the handle from the heap.
+        """
+        self._remove_node(node)
+        self._count -= 1
+        return node
+
+    def merge(self, another):
+        """
+        Melds another Fibonacci heap into this one in O(1).
+        """
+        if type(another) is not type(self) or \
+                another._cmpfunc is not self._cmpfunc or \
+                another._keyfunc is not self._keyfunc:
+            return False
+        other = another._min
+        if other:
+            if self._min is None:
+                self._min = other
+            else:
+                self._splice(self._min, other)
+                if self._cmpfunc(other.key, self._min.key) < 0:
+                    self._min = other
+        self._count += another._count
+        another.clear()
+        return True
+
+    def _roots(self):
+        node = self._min
+        if node:
+            curr = node
+            while True:
+                yield curr
+                curr = curr.right
+                if curr is node: break
+
+    def _splice(self, first, second):
+        """
+        Joins the circular lists that the two nodes are in.
+        """
+        first_right = first.right
+        second_left = second.left
+        first.right = second
+        second.left = first
+        second_left.right = first_right
+        first_right.left = second_left
+
+    def _add_root(self, node):
+        """
+        Adds a (detached) node to the root list.
+        """
+        node.parent = None
+        node.marked = False
+        node.left = node.right = node
+        if self._min is None:
+            self._min = node
+        else:
+            self._splice(self._min, node)
+            if self._cmpfunc(node.key, self._min.key) < 0:
+                self._min = node
+
+    def _remove_node(self, node):
+        """
+        Detaches a node from the heap moving its children to the root list.
+        """
+        parent = node.parent
+        if parent:
+            self._cut(node, parent)
+            self._cascading_cut(parent)
+        self._extract_root(node)
+
+    def _extract_root(self, node):
+        """
+        Removes a node from the root list, moves its children to the root list
+        and consolidates the roots.
+        """
+        child = node.child
+        if child:
+            for curr in node.children:
+                curr.parent = None
+                curr.marked = False
+            self._splice(node, child)
+            node.child = None
+
+        node.left.right = node.right
+        node.right.left = node.left
+        if node.right is node:
+            self._min = None
+        else:
+            self._min = node.right
+            self._consolidate()
+        node.left = node.right = node
+        node.degree = 0
+
+    def _consolidate(self):
+        """
+        Links roots of equal degree till all roots have distinct degrees.
+        """
+        table = []
+        for node in list(self._roots()):
+            degree = node.degree
+            while degree < len(table) and table[degree] is not None:
+                other = table[degree]
+                if self._cmpfunc(other.key, node.key) < 0:
+                    node, other = other, node
+                self._link(other, node)
+                table[degree] = None
+                degree += 1
+            if degree >= len(table):
+                table.extend([None] * (degree + 1 - len(table)))
+            table[degree] = node
+
+        self._min = None
+        for node in table:
+            if node: self._add_root(node)
+
+    def _link(self, child, parent):
+        """
+        Makes a root the child of another root.
+        """
+        child.parent = parent
+        child.marked = False
+        child.left = child.right = child
+        if parent.child is None:
+            parent.child = child
+        else:
+            self._splice(parent.child, child)
+        parent.degree += 1
+
+    def _cut(self, node, parent):
+        """
+        Cuts a node from its parent and moves it to the root list.
+        """
+        if node.right is node:
+            parent.child = None
+        else:
+            node.left.right = node.right
+            node.right.left = node.left
+            if parent.child is node:
+                parent.child = node.right
+        parent.degree -= 1
+        self._add_root(node)
+
+    def _cascading_cut(self, node):
+        """
+        Marks a node that has lost a child or cuts it (and continues up the tree)
+        if it has already lost one.
+        """
+        parent = node.parent
+        while parent:
+            if not node.marked:
+                node.marked = True
+                break
+            self._cut(node, parent)
+            node = parent
+            parent = node.parent
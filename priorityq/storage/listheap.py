@@ -3,16 +3,16 @@ from base import Handle as BaseHandle
 from base import Storage as BaseStorage
 
 class Handle(BaseHandle):
-    def __init__(self, value, index):
-        super(Handle, self).__init__(value)
+    def __init__(self, value, key, index):
+        super(Handle, self).__init__(value, key)
         self.index = index
 
 class Storage(BaseStorage):
     """
     A simple list based heap.
     """
-    def __init__(self, cmpfunc = cmp):
-        super(Storage, self).__init__(cmpfunc)
+    def __init__(self, cmpfunc = cmp, keyfunc = None):
+        super(Storage, self).__init__(cmpfunc, keyfunc)
         self._handles = []
 
     def clear(self):
@@ -28,7 +28,7 @@ class Storage(BaseStorage):
 
     def all_handles(self):
         out = self._handles[:]
-        out.sort(cmp = lambda x,y: self._cmpfunc(x.value, y.value))
+        out.sort(cmp = lambda x,y: self._cmpfunc(x.key, y.key))
         return out
 
     def push(self, value):
@@ -36,10 +36,17 @@ class Storage(BaseStorage):
         Pushes a new value onto this heap storage and returns a Handle
         to the node in question.
         """
-        currptr = Handle(value, len(self._handles))
+        currptr = Handle(value, self._keyof(value), len(self._handles))
         self._handles.append(currptr)
         return currptr
 
+    def adjust(self, handle):
+        """
+        Called when the value pointed by the handle has been updated.  As the
+        list is not kept in order only the cached key needs to be refreshed.
+        """
+        handle.key = self._keyof(handle.value)
+
     def pop(self):
         """
         Pops the top value and returns the value held by the last top value.
@@ -69,6 +76,6 @@ class Storage(BaseStorage):
     def _minindex(self):
         index,handle = -1,None
         for i,h in enumerate(self._handles):
-            if handle is None or self._cmpfunc(h.value, handle.value) < 0:
+            if handle is None or self._cmpfunc(h.key, handle.key) < 0:
                 index,handle = i,h
         return index,handle
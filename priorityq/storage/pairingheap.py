@@ -0,0 +1,186 @@
+
+from base import Handle as BaseHandle
+from base import Storage as BaseStorage
+
+class Node(BaseHandle):
+    def __init__(self, value, key):
+        super(Node, self).__init__(value, key)
+        self.child = None
+        self.next = None
+        # The previous sibling of this node or its parent if this is the first child
+        self.prev = None
+
+    @property
+    def children(self):
+        """Return an iterator over the children of a given node."""
+        curr = self.child
+        while curr:
+            yield curr
+            curr = curr.next
+
+    def __repr__(self): return str(self)
+    def __str__(self):
+        return "<Node (0x%x), Value: %s>" % (id(self), str(self.value))
+
+class Storage(BaseStorage):
+    """
+    A pairing heap where each node is a handle.
+
+    Pushes and melds are O(1) and a pop is O(log n) amortized.  Decreasing the
+    key of a node is O(1) amortized as the node (with its subtree) is simply
+    cut from its parent and melded with the root.  Any other adjustment cuts
+    the node out and reinserts it.
+
+    Decreases can only be told apart from other adjustments when a key function
+    is used as the previous key of the node is then known.  Without one every
+    adjustment is treated as a general one.
+    """
+    def __init__(self, cmpfunc = cmp, keyfunc = None):
+        super(Storage, self).__init__(cmpfunc, keyfunc)
+        self.clear()
+
+    def __nonzero__(self):
+        return self._count > 0
+
+    def __len__(self):
+        """
+        Returns the number of elements in the heap.
+        """
+        return self._count
+
+    def clear(self):
+        """Removes all elements from the heap."""
+        self._count = 0
+        self._root = None
+
+    def all_handles(self):
+        out = []
+        stack = [self._root] if self._root else []
+        while stack:
+            node = stack.pop()
+            out.append(node)
+            stack.extend(node.children)
+        out.sort(cmp = lambda x,y: self._cmpfunc(x.key, y.key))
+        return out
+
+    def top(self):
+        """
+        Returns a handle to the top value.
+        """
+        return self._root
+
+    def push(self, value):
+        """
+        Pushes a new value onto this heap storage and returns a handle to it.
+        """
+        node = Node(value, self._keyof(value))
+        self._root = self._meld(self._root, node)
+        self._count += 1
+        return node
+
+    def pop(self):
+        """
+        Pops the top value and returns a handle to it.
+        """
+        return self.remove(self._root)
+
+    def adjust(self, node):
+        """
+        Called when the value pointed by the handle has been updated so a
+        possible reheaping is required.
+        """
+        oldkey = node.key
+        node.key = self._keyof(node.value)
+        if self._keyfunc is not None and self._cmpfunc(node.key, oldkey) <= 0:
+            # The key has decreased so the subtree under the node is still in
+            # order and only the link to its parent has to be broken.
+            if node is not self._root:
+                self._cut(node)
+                self._root = self._meld(self._root, node)
+        elif node.child is not None or node is not self._root:
+            # Otherwise reinsert the node by itself
+            self._remove_node(node)
+            self._root = self._meld(self._root, node)
+        return node
+
+    def remove(self, node):
+        """
+        Removes the node referenced by the handle from the heap.
+        """
+        self._remove_node(node)
+        self._count -= 1
+        return node
+
+    def merge(self, another):
+        """
+        Melds another pairing heap into this one in O(1).
+        """
+        if type(another) is not type(self) or \
+                another._cmpfunc is not self._cmpfunc or \
+                another._keyfunc is not self._keyfunc:
+            return False
+        self._root = self._meld(self._root, another._root)
+        self._count += another._count
+        another.clear()
+        return True
+
+    def _remove_node(self, node):
+        """
+        Detaches a node from the heap, merging its children back into the heap.
+        """
+        if node is self._root:
+            self._root = self._merge_pairs(node.child)
+        else:
+            self._cut(node)
+            self._root = self._meld(self._root, self._merge_pairs(node.child))
+        node.child = None
+
+    def _cut(self, node):
+        """
+        Detaches a node (along with its subtree) from its parent and siblings.
+        """
+        if node.prev.child is node:
+            node.prev.child = node.next
+        else:
+            node.prev.next = node.next
+        if node.next:
+            node.next.prev = node.prev
+        node.prev = node.next = None
+
+    def _meld(self, first, second):
+        """
+        Melds two trees (with no siblings) and returns the new root.
+        """
+        if first is None: return second
+        if second is None: return first
+        if self._cmpfunc(second.key, first.key) < 0:
+            first, second = second, first
+        second.next = first.child
+        if first.child:
+            first.child.prev = second
+        second.prev = first
+        first.child = second
+        return first
+
+    def _merge_pairs(self, first):
+        """
+        Merges a list of siblings starting with the given node into a single
+        tree by melding them in pairs from left to right and then melding the
+        pairs from right to left.
+        """
+        pairs = []
+        while first:
+            second = first.next
+            if second is None:
+                first.prev = None
+                pairs.append(first)
+                break
+            after = second.next
+            first.prev = first.next = second.prev = second.next = None
+            pairs.append(self._meld(first, second))
+            first = after
+
+        root = pairs.pop() if pairs else None
+        while pairs:
+            root = self._meld(pairs.pop(), root)
+        return root
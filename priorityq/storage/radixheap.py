@@ -0,0 +1,154 @@
+
+from base import Handle as BaseHandle
+from base import Storage as BaseStorage
+
+class Handle(BaseHandle):
+    def __init__(self, value, key, bucket):
+        super(Handle, self).__init__(value, key)
+        self.bucket = bucket
+
+    def __repr__(self): return str(self)
+    def __str__(self):
+        return "<Ptr (0x%x), Bucket: %d, Value: %s>" % (id(self), self.bucket, str(self.value))
+
+class Storage(BaseStorage):
+    """
+    A radix heap for non-negative integer keys that are popped in monotone
+    (non-decreasing) order, as in Dijkstra's algorithm or event simulations.
+
+    Values are kept in buckets by the highest bit in which their key differs
+    from the last popped key, so bucket 0 holds keys equal to the last popped
+    key and bucket i holds keys that first differ from it in bit i-1.  A pop
+    from an empty bucket 0 takes the smallest key in the first non empty
+    bucket as the new last key and redistributes that bucket into the lower
+    buckets.  Each value can only move down a bucket at a time so pushes,
+    pops and decreases are O(log C) amortized (C being the largest key) and
+    no comparator is ever called.
+
+    Keys are compared by their natural order so a custom comparator is not
+    supported.  Pushing or adjusting a value to a key smaller than the last
+    popped key raises a ValueError.
+    """
+    def __init__(self, cmpfunc = cmp, keyfunc = None, start = 0):
+        """
+        **Keyword Arguments**
+            start   -   The smallest key that can be pushed till the first pop.  Default: 0
+        """
+        self._start = start
+        super(Storage, self).__init__(cmpfunc, keyfunc)
+        self.clear()
+
+    def clear(self):
+        """Removes all elements from the heap."""
+        self._count = 0
+        self._last = self._start
+        self._buckets = [set()]
+
+    def all_handles(self):
+        out = []
+        for bucket in self._buckets:
+            out.extend(bucket)
+        out.sort(key = lambda h: h.key)
+        return out
+
+    def __nonzero__(self):
+        return self._count > 0
+
+    def __len__(self):
+        """
+        Returns the number of elements in the heap.
+        """
+        return self._count
+
+    def top(self):
+        """
+        Returns a handle to the top value.
+
+        Unlike a pop this does not redistribute any buckets as the last popped
+        key (and hence the smallest key that can still be pushed) must not
+        change.
+        """
+        for bucket in self._buckets:
+            if bucket:
+                return min(bucket, key = lambda h: h.key)
+        raise IndexError("top of empty heap")
+
+    def push(self, value):
+        """
+        Pushes a new value onto this heap storage and returns a Handle
+        to the node in question.
+        """
+        handle = Handle(value, self._keyof(value), 0)
+        self._insert(handle)
+        self._count += 1
+        return handle
+
+    def pop(self):
+        """
+        Pops the top value and returns a handle to it.
+        """
+        self._settle()
+        handle = self._buckets[0].pop()
+        self._count -= 1
+        return handle
+
+    def adjust(self, handle):
+        """
+        Called when the value pointed by the handle has been updated so it is
+        moved to the bucket for its new key.
+        """
+        key = self._keyof(handle.value)
+        self._check_key(handle.value, key)
+        self._buckets[handle.bucket].remove(handle)
+        handle.key = key
+        self._insert(handle)
+        return handle
+
+    def remove(self, handle):
+        """
+        Removes the node referenced by the handle from the heap.
+        """
+        self._buckets[handle.bucket].remove(handle)
+        self._count -= 1
+        return handle
+
+    def _comparator_changed(self):
+        if self._cmpfunc is not cmp:
+            raise ValueError("radixheap.Storage only orders keys by their natural order.  Use a key function instead of a comparator.")
+        super(Storage, self)._comparator_changed()
+
+    def _check_key(self, value, key):
+        if key < self._last:
+            raise ValueError("Key (%s) of value (%s) is smaller than the last popped key (%s)" % (str(key), str(value), str(self._last)))
+
+    def _insert(self, handle):
+        key = handle.key
+        self._check_key(handle.value, key)
+        bucket = (key ^ self._last).bit_length()
+        buckets = self._buckets
+        if bucket >= len(buckets):
+            buckets.extend(set() for i in xrange(bucket + 1 - len(buckets)))
+        handle.bucket = bucket
+        buckets[bucket].add(handle)
+
+    def _settle(self):
+        """
+        Ensures that bucket 0 contains the smallest keys by redistributing the
+        first non empty bucket if bucket 0 is empty.
+        """
+        buckets = self._buckets
+        if buckets[0]:
+            return
+        for index in xrange(1, len(buckets)):
+            if buckets[index]:
+                break
+        else:
+            raise IndexError("top of empty heap")
+
+        bucket = buckets[index]
+        buckets[index] = set()
+        last = self._last = min(h.key for h in bucket)
+        for handle in bucket:
+            newbucket = (handle.key ^ last).bit_length()
+            handle.bucket = newbucket
+            buckets[newbucket].add(handle)
@@ -0,0 +1,215 @@
+"""
+Opt-in instrumentation of storages.
+
+A storage is instrumented by switching its class to a subclass whose operations record
+what they did in a Stats instance and by wrapping its comparator in one that counts its
+calls:
+
+    from priorityq.storage import stats
+    collector = stats.instrument(pq.storage)
+    ...
+    print collector.as_dict()
+    stats.uninstrument(pq.storage)
+
+Storages that are not instrumented are left as they are, so instrumentation costs
+nothing till it is turned on.  Instrumented storages are not melded with other storages
+as their comparators differ.
+"""
+
+from collections import defaultdict
+
+# Public operations of a storage whose work is recorded
+OPERATIONS = ["push", "pop", "top", "adjust", "remove", "heapify", "merge", "all_handles", "clear",
+              "pop_many", "adjust_many", "remove_many", "snapshot", "restore"]
+
+# Methods that move a handle between the index given to them and the index they
+# return (or the index of the handle for _sift_out).
+SIFTS = ["_upheap", "_downheap"]
+
+class Stats(object):
+    """
+    Counters of the work done by the operations of an instrumented storage.
+
+    **Attributes**
+        operations          -   The number of calls of each operation.
+        comparisons         -   A histogram, for each operation, of the number of comparator
+                                calls made by each call of the operation.
+        sift_lengths        -   A histogram, for each operation, of the number of levels that
+                                handles were moved by each call of the operation.  Each level
+                                is one handle moved (swapped) in the heap's array.  Only heaps
+                                whose positions are array indexes are measured.
+        released_indexes    -   The number of empty slots released (binheap._release_index)
+                                by each operation.
+    """
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Clears all the counters."""
+        self.operations = defaultdict(int)
+        self.comparisons = defaultdict(lambda: defaultdict(int))
+        self.sift_lengths = defaultdict(lambda: defaultdict(int))
+        self.released_indexes = defaultdict(int)
+        self._operation = None
+        self._comparisons = 0
+        self._sift_length = 0
+
+    def total_comparisons(self):
+        """Returns the number of comparator calls across all operations."""
+        return sum(n * count for histogram in self.comparisons.itervalues() for n,count in histogram.iteritems())
+
+    def total_swaps(self):
+        """Returns the number of levels that handles were moved across all operations."""
+        return sum(n * count for histogram in self.sift_lengths.itervalues() for n,count in histogram.iteritems())
+
+    def as_dict(self):
+        """Returns the counters as plain dicts (eg for dumping as JSON)."""
+        return {
+            "operations": dict(self.operations),
+            "comparisons": dict((op, dict(h)) for op,h in self.comparisons.iteritems()),
+            "sift_lengths": dict((op, dict(h)) for op,h in self.sift_lengths.iteritems()),
+            "released_indexes": dict(self.released_indexes),
+        }
+
+    def _begin(self, operation):
+        self._operation = operation
+        self._comparisons = 0
+        self._sift_length = 0
+
+    def _end(self):
+        operation = self._operation
+        self.operations[operation] += 1
+        self.comparisons[operation][self._comparisons] += 1
+        self.sift_lengths[operation][self._sift_length] += 1
+        self._operation = None
+
+def instrument(storage, stats = None):
+    """Starts recording the work done by a storage.
+
+    **Parameters**
+        storage     -   The storage to instrument.
+
+    **Keyword Arguments**
+        stats       -   The Stats to record into.  Default: a new Stats instance
+
+    **Returns**
+        The Stats the storage records into (also available as storage.stats).
+    """
+    if isinstance(storage, InstrumentedStorage):
+        uninstrument(storage)
+    stats = stats or Stats()
+    cmpfunc = storage._cmpfunc
+    storage.__class__ = _instrumented_class(storage.__class__)
+    storage.stats = stats
+    storage._uncounted_cmpfunc = cmpfunc
+    storage._cmpfunc = _counting_comparator(cmpfunc, stats)
+    return stats
+
+def uninstrument(storage):
+    """Stops recording the work done by a storage and returns its Stats."""
+    if not isinstance(storage, InstrumentedStorage):
+        return None
+    stats = storage.stats
+    storage._cmpfunc = storage._uncounted_cmpfunc
+    storage.__class__ = storage._storage_class
+    del storage.stats
+    del storage._uncounted_cmpfunc
+    return stats
+
+class InstrumentedStorage(object):
+    """
+    Mixin of the classes instrumented storages are switched to.
+    """
+    @property
+    def comparator(self):
+        return self._uncounted_cmpfunc
+
+    @comparator.setter
+    def comparator(self, cmpfunc):
+        self._uncounted_cmpfunc = cmpfunc
+        self._cmpfunc = _counting_comparator(cmpfunc, self.stats)
+        self._comparator_changed()
+
+    def _comparator_changed(self):
+        # Storages may check which comparator they have been given
+        counting_cmpfunc = self._cmpfunc
+        self._cmpfunc = self._uncounted_cmpfunc
+        try:
+            super(InstrumentedStorage, self)._comparator_changed()
+        finally:
+            self._cmpfunc = counting_cmpfunc
+
+_instrumented_classes = {}
+
+def _instrumented_class(storage_class):
+    out = _instrumented_classes.get(storage_class)
+    if out is None:
+        members = {"__module__": storage_class.__module__, "_storage_class": storage_class}
+        for name in OPERATIONS:
+            if callable(getattr(storage_class, name, None)):
+                members[name] = _recorded_operation(name, getattr(storage_class, name))
+        for name in SIFTS:
+            if hasattr(storage_class, name):
+                members[name] = _recorded_sift(getattr(storage_class, name))
+        if hasattr(storage_class, "_sift_out"):
+            members["_sift_out"] = _recorded_sift_out(storage_class._sift_out)
+        if hasattr(storage_class, "_release_index"):
+            members["_release_index"] = _recorded_release_index(storage_class._release_index)
+        out = type("Instrumented" + storage_class.__name__, (InstrumentedStorage, storage_class), members)
+        _instrumented_classes[storage_class] = out
+    return out
+
+def _counting_comparator(cmpfunc, stats):
+    def counting_cmpfunc(a, b):
+        stats._comparisons += 1
+        return cmpfunc(a, b)
+    return counting_cmpfunc
+
+def _recorded_operation(name, method):
+    def operation(self, *args, **kwargs):
+        stats = self.stats
+        if stats._operation is not None:
+            # Called from within another operation (eg pop calling remove)
+            return method(self, *args, **kwargs)
+        stats._begin(name)
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            stats._end()
+    operation.__name__ = name
+    operation.__doc__ = method.__doc__
+    return operation
+
+def _levels(start, end, arity):
+    """Returns the number of levels between two indexes of a heap, one being the ancestor of the other."""
+    if start < end:
+        start, end = end, start
+    levels = 0
+    while start > end:
+        start = (start - 1) / arity
+        levels += 1
+    return levels
+
+def _recorded_sift(method):
+    def sift(self, start, *args, **kwargs):
+        end = method(self, start, *args, **kwargs)
+        # Node based heaps sift nodes rather than indexes
+        if isinstance(start, (int, long)):
+            self.stats._sift_length += _levels(start, end, getattr(self, "arity", 2))
+        return end
+    sift.__name__ = method.__name__
+    return sift
+
+def _recorded_sift_out(method):
+    def sift_out(self, handle):
+        start = handle.index
+        method(self, handle)
+        self.stats._sift_length += _levels(start, handle.index, 2)
+        return handle
+    return sift_out
+
+def _recorded_release_index(method):
+    def release_index(self, index):
+        self.stats.released_indexes[self.stats._operation] += 1
+        return method(self, index)
+    return release_index
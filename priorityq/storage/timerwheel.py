@@ -0,0 +1,194 @@
+
+from base import Handle as BaseHandle
+from base import Storage as BaseStorage
+
+class Handle(BaseHandle):
+    def __init__(self, value, key, level, slot):
+        super(Handle, self).__init__(value, key)
+        self.level = level
+        self.slot = slot
+
+    def __repr__(self): return str(self)
+    def __str__(self):
+        return "<Ptr (0x%x), Level: %d, Slot: %d, Value: %s>" % (id(self), self.level, self.slot, str(self.value))
+
+class Storage(BaseStorage):
+    """
+    A hierarchical timing wheel for non-negative integer keys (eg deadlines in
+    ticks) that are popped in monotone (non-decreasing) order.
+
+    Keys are split into digits of slot_bits bits each and each wheel (level)
+    has a slot for every digit.  A key is put in the wheel of the highest
+    digit in which it differs from the current time (the last popped key) and
+    in the slot of its digit in that wheel, so all keys in a slot of the
+    lowest wheel are equal and keys in lower wheels are smaller than those in
+    higher ones.  Pushes, removes and adjusts only add to or discard from a
+    slot and are O(1).  A pop from an empty lowest wheel cascades the first
+    occupied slot of the next occupied wheel into the wheels below it, which
+    each key goes through at most once per wheel.  A bitmap of the occupied
+    slots in each wheel is kept so the first occupied slot is found without
+    scanning.
+
+    Keys are compared by their natural order so a custom comparator is not
+    supported.  Pushing or adjusting a value to a key smaller than the last
+    popped key raises a ValueError.
+    """
+    def __init__(self, cmpfunc = cmp, keyfunc = None, start = 0, slot_bits = 6):
+        """
+        **Keyword Arguments**
+            start       -   The smallest key that can be pushed till the first pop.  Default: 0
+            slot_bits   -   The number of bits of a key covered by each wheel.  Each
+                            wheel has 2 ** slot_bits slots.  Default: 6
+        """
+        if slot_bits < 1:
+            raise ValueError("slot_bits must be at least 1")
+        self._start = start
+        self._slot_bits = slot_bits
+        self._num_slots = 1 << slot_bits
+        super(Storage, self).__init__(cmpfunc, keyfunc)
+        self.clear()
+
+    def clear(self):
+        """Removes all elements from the heap."""
+        self._count = 0
+        self._now = self._start
+        self._wheels = []
+        self._occupied = []
+        self._add_wheel()
+
+    def all_handles(self):
+        out = []
+        for wheel in self._wheels:
+            for slot in wheel:
+                out.extend(slot)
+        out.sort(key = lambda h: h.key)
+        return out
+
+    def __nonzero__(self):
+        return self._count > 0
+
+    def __len__(self):
+        """
+        Returns the number of elements in the heap.
+        """
+        return self._count
+
+    def top(self):
+        """
+        Returns a handle to the top value.
+
+        Unlike a pop this does not cascade any slots as the current time (and
+        hence the smallest key that can still be pushed) must not change.
+        """
+        for level,occupied in enumerate(self._occupied):
+            if occupied:
+                slot = self._wheels[level][_lowest_bit(occupied)]
+                if level == 0:
+                    return next(iter(slot))
+                return min(slot, key = lambda h: h.key)
+        raise IndexError("top of empty heap")
+
+    def push(self, value):
+        """
+        Pushes a new value onto this heap storage and returns a Handle
+        to the node in question.
+        """
+        handle = Handle(value, self._keyof(value), 0, 0)
+        self._check_key(handle.value, handle.key)
+        self._insert(handle)
+        self._count += 1
+        return handle
+
+    def pop(self):
+        """
+        Pops the top value and returns a handle to it.
+        """
+        if not self._occupied[0]:
+            self._cascade()
+        index = _lowest_bit(self._occupied[0])
+        slot = self._wheels[0][index]
+        handle = slot.pop()
+        if not slot:
+            self._occupied[0] &= ~(1 << index)
+        self._now = handle.key
+        self._count -= 1
+        return handle
+
+    def adjust(self, handle):
+        """
+        Called when the value pointed by the handle has been updated so it is
+        moved to the slot for its new key.
+        """
+        key = self._keyof(handle.value)
+        self._check_key(handle.value, key)
+        self._discard(handle)
+        handle.key = key
+        self._insert(handle)
+        return handle
+
+    def remove(self, handle):
+        """
+        Removes the node referenced by the handle from the heap.
+        """
+        self._discard(handle)
+        self._count -= 1
+        return handle
+
+    def _comparator_changed(self):
+        if self._cmpfunc is not cmp:
+            raise ValueError("timerwheel.Storage only orders keys by their natural order.  Use a key function instead of a comparator.")
+        super(Storage, self)._comparator_changed()
+
+    def _add_wheel(self):
+        self._wheels.append([set() for i in xrange(self._num_slots)])
+        self._occupied.append(0)
+
+    def _check_key(self, value, key):
+        if key < self._now:
+            raise ValueError("Key (%s) of value (%s) is smaller than the last popped key (%s)" % (str(key), str(value), str(self._now)))
+
+    def _insert(self, handle):
+        key = handle.key
+        diff = key ^ self._now
+        level = (diff.bit_length() - 1) / self._slot_bits if diff else 0
+        while level >= len(self._wheels):
+            self._add_wheel()
+        index = (key >> (level * self._slot_bits)) & (self._num_slots - 1)
+        handle.level = level
+        handle.slot = index
+        self._wheels[level][index].add(handle)
+        self._occupied[level] |= 1 << index
+
+    def _discard(self, handle):
+        slot = self._wheels[handle.level][handle.slot]
+        slot.remove(handle)
+        if not slot:
+            self._occupied[handle.level] &= ~(1 << handle.slot)
+
+    def _cascade(self):
+        """
+        Moves the values in the first occupied slot of the lowest occupied
+        wheel into the lower wheels.  The current time is moved up to the
+        smallest key among them (which is the next key to be popped) so at
+        least that key lands in the lowest wheel.  Values in other slots and
+        higher wheels are unaffected as they differ from the new time in the
+        same digit as from the old one.
+        """
+        for level in xrange(1, len(self._wheels)):
+            if self._occupied[level]:
+                break
+        else:
+            raise IndexError("pop from empty heap")
+
+        index = _lowest_bit(self._occupied[level])
+        wheel = self._wheels[level]
+        slot = wheel[index]
+        wheel[index] = set()
+        self._occupied[level] &= ~(1 << index)
+        self._now = min(h.key for h in slot)
+        for handle in slot:
+            self._insert(handle)
+
+def _lowest_bit(bits):
+    """Returns the index of the lowest set bit."""
+    return (bits & -bits).bit_length() - 1
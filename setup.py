@@ -45,7 +45,7 @@ def get_description():
 setup(name="priorityq",
       version=get_version(),
       requires = [ ],
-      extras_require={'docs': ['Sphinx>=1.1']},
+      extras_require={'docs': ['Sphinx>=1.1'], 'async': ['trollius']},
       tests_require = [ "pytest" ],
       description="A flexible priority queue library with support for pluggable storage strategies and fast lookups and mutability.",
       long_description=get_description(),
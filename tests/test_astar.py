@@ -0,0 +1,65 @@
+import pytest
+import math
+import random
+from priorityq.algorithms import astar
+from priorityq.algorithms import dijkstra
+from priorityq.storage import binheap
+from priorityq.storage import pairingheap
+
+edges = [
+    (1, 2, 7), (1, 3, 9), (1, 6, 14),
+    (2, 3, 10), (2, 4, 15),
+    (3, 4, 11), (3, 6, 2),
+    (4, 5, 6),
+    (6, 5, 9),
+    (5, 1, 3)
+]
+
+def neighbours(node):
+    return [(t, w) for s,t,w in edges if s == node]
+
+def grid(size, seed):
+    """A grid graph whose edge weights are no less than the distance between the nodes."""
+    rnd = random.Random(seed)
+    coordinates = {}
+    graph = {}
+    for x in xrange(size):
+        for y in xrange(size):
+            coordinates[(x, y)] = (x * 10, y * 10)
+            graph[(x, y)] = {}
+            for nx,ny in [(x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)]:
+                if 0 <= nx < size and 0 <= ny < size:
+                    graph[(x, y)][(nx, ny)] = rnd.randint(10, 15)
+    return graph, coordinates
+
+@pytest.mark.parametrize("storage_class", [binheap.Storage, pairingheap.Storage])
+def test_shortest_path(storage_class):
+    distances, parents = astar.shortest_path(1, 5, neighbours, lambda n,t: 0, storage_class)
+    assert distances[5] == 20
+    assert parents[5] == 6 and parents[6] == 3 and parents[3] == 1
+    distances, parents = astar.shortest_path(1, 7, neighbours, lambda n,t: 0, storage_class)
+    assert distances[7] == dijkstra.INFINITY
+
+@pytest.mark.parametrize("seed", range(3))
+def test_euclidean_matches_dijkstra(seed):
+    graph, coordinates = grid(15, seed)
+    neighbour_func = lambda n: graph[n].iteritems()
+    heuristic = astar.euclidean_heuristic(coordinates)
+    rnd = random.Random(seed)
+    for i in xrange(10):
+        source = (rnd.randint(0, 14), rnd.randint(0, 14))
+        target = (rnd.randint(0, 14), rnd.randint(0, 14))
+        if source == target: continue
+        expected, expected_parents = dijkstra.shortest_path(source, target, neighbour_func)
+        distances, parents = astar.shortest_path(source, target, neighbour_func, heuristic)
+        assert distances[target] == expected[target]
+        assert len(parents) <= len(expected_parents)
+
+def test_great_circle_heuristic():
+    coordinates = {1: (0, 0), 2: (0, 1), 3: (-122.4, 37.8), 4: (-118.2, 34.1)}
+    heuristic = astar.great_circle_heuristic(coordinates)
+    assert heuristic(1, 1) == 0
+    assert heuristic(1, 2) == pytest.approx(astar.EARTH_RADIUS * math.pi / 180)
+    # San Francisco to Los Angeles is about 559km
+    assert 550000 < heuristic(3, 4) < 560000
+    assert astar.great_circle_heuristic(coordinates, scale = 10)(3, 4) == pytest.approx(10 * heuristic(3, 4))
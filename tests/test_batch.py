@@ -0,0 +1,40 @@
+import pytest
+from priorityq.algorithms.dijkstra import INFINITY
+from priorityq.algorithms.graph import CSRGraph
+from priorityq.algorithms.batch import shortest_paths
+from priorityq.storage import binheap
+
+edges = [
+    (1, 2, 7), (1, 3, 9), (1, 6, 14),
+    (2, 3, 10), (2, 4, 15),
+    (3, 4, 11), (3, 6, 2),
+    (4, 5, 6),
+    (6, 5, 9),
+    (5, 1, 3)
+]
+
+expected = [
+    (1, 5, 20, [1, 3, 6, 5]),
+    (5, 4, 23, [5, 1, 3, 4]),
+    (2, 6, 12, [2, 3, 6]),
+    (1, 0, INFINITY, []),
+]
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_shortest_paths(processes):
+    graph = CSRGraph.from_edges(7, edges)
+    queries = [(source, target) for source,target,dist,path in expected]
+    results = list(shortest_paths(queries, graph, processes))
+    assert all(timetaken >= 0 for s,t,d,p,timetaken in results)
+    assert sorted(r[:4] for r in results) == sorted(expected)
+
+def test_shortest_paths_storage_class():
+    graph = CSRGraph.from_edges(7, edges)
+    results = shortest_paths([(1, 5)] * 10, graph, 2, binheap.Storage, chunksize = 3)
+    assert [r[:4] for r in results] == [(1, 5, 20, [1, 3, 6, 5])] * 10
+
+def test_shortest_paths_stopped_early():
+    graph = CSRGraph.from_edges(7, edges)
+    results = shortest_paths([(1, 5)] * 100, graph, 2)
+    assert next(results)[2] == 20
+    results.close()
@@ -0,0 +1,38 @@
+import json
+import pytest
+from priorityq import bench
+from priorityq.bench import workloads
+from priorityq.bench.__main__ import main
+
+@pytest.mark.parametrize("storage", bench.STORAGES)
+def test_run(storage):
+    results = list(bench.run(storages = [storage], sizes = [50, 10], repeat = 2))
+    assert len(results) == len(workloads.WORKLOADS) * 2
+    assert [r["size"] for r in results[:2]] == [10, 50]
+    for result in results:
+        assert result["storage"] == storage
+        assert result["ops"] >= result["size"]
+        assert result["seconds"] >= 0
+
+def test_time_limit():
+    results = list(bench.run(storages = ["binheap"], workloads = [workloads.push], sizes = [10, 20, 30], time_limit = 0))
+    assert [r["size"] for r in results] == [10]
+
+def test_default_sizes(monkeypatch):
+    monkeypatch.setattr(bench, "SIZES", [10, 100, 1000])
+    monkeypatch.setattr(bench, "MAX_SIZES", {"listheap": 100})
+    results = list(bench.run(storages = ["listheap", "binheap"], workloads = [workloads.push]))
+    assert [(r["storage"], r["size"]) for r in results] == \
+            [("listheap", 10), ("listheap", 100), ("binheap", 10), ("binheap", 100), ("binheap", 1000)]
+    results = list(bench.run(storages = ["listheap"], workloads = [workloads.push], sizes = [1000]))
+    assert [r["size"] for r in results] == [1000]
+
+def test_main(tmpdir):
+    path = str(tmpdir.join("out.json"))
+    main(["--storages", "binheap,radixheap", "--workloads", "push,adjust", "--sizes", "1e2", "--output", path])
+    output = json.load(open(path))
+    assert "python" in output["environment"]
+    assert sorted((r["storage"], r["workload"]) for r in output["results"]) == \
+            [("binheap", "adjust"), ("binheap", "push"), ("radixheap", "adjust"), ("radixheap", "push")]
+    with pytest.raises(SystemExit):
+        main(["--workloads", "unknown"])
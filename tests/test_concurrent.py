@@ -0,0 +1,183 @@
+import pytest
+import threading
+import time
+from Queue import Empty
+from priorityq.concurrent import BlockingPQ, AsyncPQ
+
+def test_put_get():
+    pq = BlockingPQ([5, 3, 8])
+    pq.put(1)
+    pq.put_many([7, 2])
+    assert len(pq) == 6 and 7 in pq
+    assert pq.peek() == 1
+    assert [pq.get() for i in xrange(3)] == [1, 2, 3]
+    assert pq.get_many(10) == [5, 7, 8]
+    assert pq.empty()
+    with pytest.raises(Empty):
+        pq.get(block = False)
+    with pytest.raises(Empty):
+        pq.peek()
+
+def test_get_timeout():
+    pq = BlockingPQ()
+    starttime = time.time()
+    with pytest.raises(Empty):
+        pq.get(timeout = 0.05)
+    assert time.time() - starttime >= 0.05
+    with pytest.raises(Empty):
+        pq.get_many(3, timeout = 0)
+
+def test_adjust_remove():
+    priorities = {"a": 3, "b": 2, "c": 1}
+    pq = BlockingPQ(["a", "b", "c"], key = priorities.__getitem__)
+    priorities["a"] = 0
+    pq.adjust("a")
+    pq.remove("c")
+    with pytest.raises(KeyError):
+        pq.remove("c")
+    priorities["d"] = 5
+    pq.adjust("d")
+    assert pq.get_many(5) == ["a", "b", "d"]
+
+def test_wakes_consumers():
+    pq = BlockingPQ()
+    results = []
+    def consumer():
+        results.append(pq.get(timeout = 5))
+    threads = [threading.Thread(target = consumer) for i in xrange(5)]
+    for thread in threads: thread.start()
+    time.sleep(0.05)
+    pq.put(3)
+    pq.put_many([4, 1, 2])
+    pq.adjust(5)
+    for thread in threads: thread.join()
+    assert sorted(results) == [1, 2, 3, 4, 5]
+
+    thread = threading.Thread(target = lambda: results.append(pq.get_many(5, timeout = 5)))
+    thread.start()
+    time.sleep(0.05)
+    pq.put_many([7, 6])
+    thread.join()
+    assert results[-1] == [6, 7]
+
+def test_producers_consumers():
+    pq = BlockingPQ(duplicates = True)
+    results = []
+    lock = threading.Lock()
+    done = threading.Event()
+    def producer(start):
+        for value in xrange(start, start + 500):
+            pq.put(value)
+    def consumer():
+        while True:
+            try:
+                values = pq.get_many(10, timeout = 0.05)
+            except Empty:
+                if done.is_set(): break
+                continue
+            with lock:
+                results.extend(values)
+    producers = [threading.Thread(target = producer, args = (i * 500,)) for i in xrange(4)]
+    consumers = [threading.Thread(target = consumer) for i in xrange(4)]
+    for thread in producers + consumers: thread.start()
+    for thread in producers: thread.join()
+    done.set()
+    for thread in consumers: thread.join()
+    assert sorted(results) == range(2000)
+
+def event_loop():
+    asyncio = pytest.importorskip("trollius")
+    return asyncio, asyncio.new_event_loop()
+
+def test_async_pop():
+    asyncio, loop = event_loop()
+    pq = AsyncPQ([5, 3], loop = loop)
+    assert loop.run_until_complete(pq.pop()) == 3
+    assert pq.pop_nowait() == 5
+    with pytest.raises(asyncio.QueueEmpty):
+        pq.pop_nowait()
+
+    # Waiters are served in order as values arrive
+    first, second = loop.create_task(pq.pop()), loop.create_task(pq.pop())
+    loop.run_until_complete(asyncio.sleep(0, loop = loop))
+    assert not first.done()
+    loop.call_soon(pq.push_many, [8, 4])
+    assert loop.run_until_complete(asyncio.gather(first, second, loop = loop)) == [4, 8]
+
+    # Cancelled waiters are skipped
+    cancelled, waiter = loop.create_task(pq.pop()), loop.create_task(pq.pop())
+    loop.run_until_complete(asyncio.sleep(0, loop = loop))
+    cancelled.cancel()
+    loop.call_soon(pq.push, 1)
+    assert loop.run_until_complete(waiter) == 1
+    assert cancelled.cancelled()
+    loop.close()
+
+def test_async_pops_smallest():
+    # A woken consumer takes the top value when it resumes, not the first value pushed
+    asyncio, loop = event_loop()
+    pq = AsyncPQ(loop = loop)
+    waiter = loop.create_task(pq.pop())
+    loop.run_until_complete(asyncio.sleep(0, loop = loop))
+    def push():
+        pq.push(10)
+        pq.push(1)
+    loop.call_soon(push)
+    assert loop.run_until_complete(waiter) == 1
+    assert len(pq) == 1 and 10 in pq
+    loop.close()
+
+def test_async_cancel_after_wake():
+    # A consumer that is cancelled after being woken leaves the value for the next one
+    asyncio, loop = event_loop()
+    pq = AsyncPQ(loop = loop)
+    cancelled, waiter = loop.create_task(pq.pop()), loop.create_task(pq.pop())
+    loop.run_until_complete(asyncio.sleep(0, loop = loop))
+    def push_and_cancel():
+        pq.push(5)
+        cancelled.cancel()
+    loop.call_soon(push_and_cancel)
+    assert loop.run_until_complete(waiter) == 5
+    assert cancelled.cancelled() and len(pq) == 0
+
+    # And the value can still be adjusted or removed till a consumer takes it
+    cancelled = loop.create_task(pq.pop())
+    loop.run_until_complete(asyncio.sleep(0, loop = loop))
+    pq.push(7)
+    cancelled.cancel()
+    loop.run_until_complete(asyncio.sleep(0, loop = loop))
+    assert cancelled.cancelled() and 7 in pq
+    pq.remove(7)
+    assert len(pq) == 0
+    loop.close()
+
+def test_async_adjust_remove():
+    asyncio, loop = event_loop()
+    priorities = {"a": 3, "b": 2, "c": 1}
+    pq = AsyncPQ(["a", "b", "c"], key = priorities.__getitem__, loop = loop)
+    priorities["a"] = 0
+    pq.adjust("a")
+    pq.remove("c")
+    assert "c" not in pq and len(pq) == 2
+    assert [loop.run_until_complete(pq.pop()) for i in xrange(2)] == ["a", "b"]
+
+    waiter = loop.create_task(pq.pop())
+    priorities["d"] = 5
+    loop.call_soon(pq.adjust, "d")
+    assert loop.run_until_complete(waiter) == "d"
+    loop.close()
+
+def test_async_pop_until():
+    asyncio, loop = event_loop()
+    pq = AsyncPQ(loop = loop)
+    with pytest.raises(asyncio.TimeoutError):
+        loop.run_until_complete(pq.pop_until(loop.time() + 0.02))
+
+    # A timed out waiter does not take a value
+    pq.push(1)
+    assert len(pq) == 1 and not pq._waiters
+    assert loop.run_until_complete(pq.pop_until(loop.time() + 10)) == 1
+    waiter = loop.create_task(pq.pop_until(loop.time() + 10))
+    loop.call_later(0.01, pq.push, 2)
+    assert loop.run_until_complete(waiter) == 2
+    loop.close()
@@ -1,13 +1,35 @@
 
 # import unittest
+import os
 import pytest
+import cPickle
+from StringIO import StringIO
 from priorityq import PQ
 from priorityq.storage import binheap
 from priorityq.storage import listheap
+from priorityq.storage import arrayheap
+from priorityq.storage import pairingheap
+from priorityq.storage import binomialheap
+from priorityq.storage import fibheap
+from priorityq.storage import daryheap
+from priorityq.storage import radixheap
+from priorityq.storage import compactheap
+from priorityq.storage import timerwheel
+from priorityq.storage import external
 
 storage_classes = [
     listheap.Storage,
-    binheap.Storage
+    binheap.Storage,
+    pairingheap.Storage,
+    binomialheap.Storage,
+    fibheap.Storage,
+    daryheap.Storage,
+    compactheap.Storage
+]
+
+# Storages that only order values by keys in their natural order
+keyed_storage_classes = storage_classes + [
+    arrayheap.Storage
 ]
 
 class Value(object):
@@ -19,7 +41,7 @@ class Value(object):
     def __str__(self):
         return "<Value (0x%x): %d>" % (id(self), self.value)
 
-@pytest.mark.parametrize("StorageClass", storage_classes)
+@pytest.mark.parametrize("StorageClass", keyed_storage_classes)
 def test_basic(StorageClass):
     values = [5,1,10,4,2,6,7]
     pq = PQ(values, store = StorageClass())
@@ -40,7 +62,7 @@ def test_reverse(StorageClass):
     for v in revlist:
         assert v == pq.pop()
 
-@pytest.mark.parametrize("StorageClass", storage_classes)
+@pytest.mark.parametrize("StorageClass", keyed_storage_classes)
 def test_push(StorageClass):
     # Add a bunch of values, and find the entries
     pq = PQ(store = StorageClass())
@@ -89,3 +111,511 @@ def test_adjust(StorageClass):
     ptr.value.value = 1
     pq.adjust(ptr)
     assert pq.top.value == values[0]
+
+@pytest.mark.parametrize("StorageClass", keyed_storage_classes)
+def test_key(StorageClass):
+    values = [5,1,10,4,2,6,7]
+    pq = PQ(values, store = StorageClass(), key = lambda x: -x)
+    revlist = list(reversed(sorted(values)))
+    pqvalues = [h.value for h in list(pq)]
+    assert revlist == pqvalues
+    for v in revlist:
+        assert v == pq.pop()
+
+@pytest.mark.parametrize("StorageClass", keyed_storage_classes)
+def test_key_adjust(StorageClass):
+    # Keys are cached so they must only be reevaluated on an adjust
+    priorities = {"a": 5, "b": 2, "c": 10}
+    pq = PQ(priorities.keys(), store = StorageClass(), key = priorities.__getitem__)
+    assert pq.top.value == "b"
+
+    priorities["a"] = 1
+    assert pq.top.value == "b"
+    pq.adjust("a")
+    assert pq.top.value == "a"
+
+    priorities["a"] = 20
+    pq.adjust(pq.find("a"))
+    assert [pq.pop() for i in xrange(3)] == ["b", "c", "a"]
+
+@pytest.mark.parametrize("StorageClass", keyed_storage_classes)
+def test_key_remove(StorageClass):
+    values = [5,1,10,4,2,6,7]
+    pq = PQ(values, store = StorageClass(), key = lambda x: -x)
+    pq.remove(10)
+    pq.remove(pq.find(1))
+    assert pq.find(10) == None
+    assert len(pq) == 5
+    assert [pq.pop() for i in xrange(5)] == [7,6,5,4,2]
+    assert not pq
+
+def test_arrayheap_stale_handles():
+    pq = PQ([1, 2], store = arrayheap.Storage(), duplicates = True, key = lambda v: v * 10)
+    stale = pq.find(1)
+    assert pq.pop() == 1
+    # and is not mistaken for the handle of a value that reuses its slot
+    fresh = pq.push(1)
+    assert fresh.slot == stale.slot and fresh != stale
+    with pytest.raises(KeyError):
+        pq.remove(stale)
+    assert pq.count(1) == 1
+    pq.remove(fresh)
+    assert pq.count(1) == 0 and pq.pop() == 2
+
+    # The handle returned by push is stale once its value is popped, even after its slot is reused
+    pq = PQ(store = arrayheap.Storage())
+    handle = pq.push(5)
+    pq.push(7)
+    assert pq.pop() == 5
+    pq.push(9)
+    assert handle.value == 5 and handle.key == 5
+    with pytest.raises(KeyError):
+        pq.remove(handle)
+    pq.push(5)
+    with pytest.raises(KeyError):
+        pq.remove(handle)
+    assert [pq.pop() for i in xrange(3)] == [5, 7, 9]
+
+    # A popped handle keeps its value and key
+    store = arrayheap.Storage(keyfunc = lambda v: v * 10)
+    store.push(3)
+    handle = store.pop()
+    store.push(4)
+    assert handle.value == 3 and handle.key == 30
+
+def test_arrayheap_comparator():
+    with pytest.raises(ValueError):
+        PQ(store = arrayheap.Storage(), comparator = lambda x,y: cmp(y,x))
+
+@pytest.mark.parametrize("StorageClass", keyed_storage_classes)
+def test_push_many(StorageClass):
+    pq = PQ([5,1,10], store = StorageClass())
+    # A small batch is pushed one at a time
+    handles = pq.push_many([4,10])
+    assert [h.value for h in handles] == [4]
+    # And a large one rebuilds the heap
+    handles = pq.push_many([8,3,12,0,7,1])
+    assert [h.value for h in handles] == [8,3,12,0,7]
+    assert pq.find(3) == handles[1]
+    assert len(pq) == 9
+    assert [pq.pop() for i in xrange(9)] == [0,1,3,4,5,7,8,10,12]
+
+@pytest.mark.parametrize("StorageClass", keyed_storage_classes)
+def test_push_many_duplicates(StorageClass):
+    pq = PQ([3,1,3], store = StorageClass(), duplicates = True)
+    assert len(pq) == 3
+    pq.push_many([2,1,1,4])
+    assert len(pq) == 7
+    assert len(pq.handlesByValue[1]) == 3
+    assert [pq.pop() for i in xrange(7)] == [1,1,1,2,3,3,4]
+
+@pytest.mark.parametrize("StorageClass", keyed_storage_classes)
+def test_merge(StorageClass):
+    pq1 = PQ([5,1,10,4], store = StorageClass())
+    pq2 = PQ([2,6,4,7], store = StorageClass())
+    handle = pq2.find(6)
+    pq1.merge(pq2)
+    assert not pq2 and pq2.find(6) == None
+    assert len(pq1) == 7
+    assert pq1.find(6).value == 6
+    if StorageClass in (pairingheap.Storage, binomialheap.Storage, fibheap.Storage):
+        # Handles survive a meld
+        assert pq1.find(6) is handle
+    assert [pq1.pop() for i in xrange(7)] == [1,2,4,5,6,7,10]
+
+@pytest.mark.parametrize("StorageClass", keyed_storage_classes)
+def test_merge_duplicates(StorageClass):
+    pq1 = PQ([5,1,4], store = StorageClass(), duplicates = True)
+    pq2 = PQ([1,4,4], store = StorageClass(), duplicates = True)
+    pq1.merge(pq2)
+    assert len(pq1) == 6
+    assert len(pq1.handlesByValue[4]) == 3
+    assert [pq1.pop() for i in xrange(6)] == [1,1,4,4,4,5]
+
+@pytest.mark.parametrize("StorageClass", keyed_storage_classes)
+def test_duplicates_by_handle(StorageClass):
+    priorities = {"a": 3, "b": 2, "c": 1}
+    pq = PQ(store = StorageClass(), duplicates = True, key = priorities.__getitem__)
+    handles = [pq.push(v) for v in "abacab"]
+    assert pq.count("a") == 3 and pq.count("c") == 1 and pq.count("d") == 0
+    assert sorted(h.value for h in pq.find_all("b")) == ["b", "b"] and pq.find_all("d") == []
+
+    # Only the instance referred by a handle is removed or adjusted
+    pq.remove(handles[0])
+    assert pq.count("a") == 2 and pq.find("a") in pq.find_all("a")
+    with pytest.raises(KeyError):
+        pq.remove(handles[0])
+    priorities["a"] = 0
+    pq.adjust(handles[2])
+    assert pq.pop() == "a" and pq.count("a") == 1
+
+    # All instances are removed when a value is passed
+    pq.remove("b")
+    assert pq.count("b") == 0 and "b" not in pq.handlesByValue
+    with pytest.raises(KeyError):
+        pq.remove("b")
+    assert [pq.pop() for i in xrange(len(pq))] == ["c", "a"]
+    assert pq.handlesByValue == {}
+
+@pytest.mark.parametrize("StorageClass", keyed_storage_classes)
+def test_maxsize(StorageClass):
+    import random
+    values = range(1000)
+    random.Random(1).shuffle(values)
+    pq = PQ(values[:3], store = StorageClass(), maxsize = 10)
+    for v in values[3:]:
+        handle = pq.push(v)
+        assert handle is None or handle.value == v
+        assert len(pq) <= 10
+        assert len(pq.handlesByValue) == len(pq)
+    assert pq.push(500) is None
+    assert pq.push(3) == pq.find(3)
+    assert sorted(pq.handlesByValue.keys()) == range(10)
+    assert [pq.pop() for i in xrange(3)] == [0, 1, 2]
+    pq.remove(9)
+    pq.push_many([100, 50, 2, 0])
+    assert [pq.pop() for i in xrange(10)] == [0, 2, 3, 4, 5, 6, 7, 8, 50, 100]
+
+@pytest.mark.parametrize("StorageClass", keyed_storage_classes)
+def test_maxsize_key_adjust(StorageClass):
+    priorities = dict((v, v) for v in xrange(10))
+    pq = PQ(range(5), store = StorageClass(), key = priorities.__getitem__, maxsize = 5)
+    # Make 0 the worst so 5 evicts it
+    priorities[0] = 20
+    pq.adjust(0)
+    assert pq.push(5) is not None
+    assert pq.find(0) is None
+    priorities[5] = -1
+    pq.adjust(5)
+    assert [pq.pop() for i in xrange(5)] == [5, 1, 2, 3, 4]
+
+def test_maxsize_duplicates():
+    pq = PQ([3, 1, 3, 2, 3], duplicates = True, maxsize = 4)
+    # The last 3 is no better than the worst value so it is dropped
+    assert len(pq) == 4 and len(pq.handlesByValue[3]) == 2
+    pq.push(1)
+    assert len(pq.handlesByValue[3]) == 1
+    assert [pq.pop() for i in xrange(4)] == [1, 1, 2, 3]
+
+def test_maxsize_merge():
+    pq1 = PQ([5, 1, 9], maxsize = 4)
+    pq2 = PQ([2, 8, 4], maxsize = 3)
+    pq1.merge(pq2)
+    assert not pq2
+    assert [pq1.pop() for i in xrange(4)] == [1, 2, 4, 5]
+    pq2.push_many([7, 6, 3, 2])
+    assert [pq2.pop() for i in xrange(3)] == [2, 3, 6]
+    with pytest.raises(ValueError):
+        PQ(maxsize = 0)
+
+def dump_and_load(pq, **kwargs):
+    out = StringIO()
+    pq.dump(out)
+    return PQ.load(StringIO(out.getvalue()), **kwargs)
+
+@pytest.mark.parametrize("StorageClass", keyed_storage_classes + [radixheap.Storage])
+def test_dump_load(StorageClass):
+    priorities = dict((v, (v * 37) % 101) for v in xrange(101))
+    pq = PQ(range(60), store = StorageClass(), key = priorities.__getitem__)
+    for v in xrange(60, 101): pq.push(v)
+    for v in xrange(0, 101, 3): pq.remove(v)
+    pq2 = dump_and_load(pq, store = StorageClass(), key = priorities.__getitem__)
+    assert len(pq2) == len(pq) and pq2.find(4).value == 4 and pq2.find(3) is None
+    priorities[4] = 0
+    pq2.adjust(4)
+    pq2.push(3)
+    assert pq2.pop() == 4
+    remaining = sorted(set(xrange(101)) - set(xrange(0, 101, 3)) - set([4]) | set([3]), key = priorities.__getitem__)
+    assert [pq2.pop() for i in xrange(len(pq2))] == remaining
+
+@pytest.mark.parametrize("StorageClass", [binheap.Storage, daryheap.Storage, compactheap.Storage, arrayheap.Storage])
+def test_load_without_comparisons(StorageClass):
+    from priorityq.storage import stats
+    values = [(i * 37) % 1009 for i in xrange(1009)]
+    pq = PQ(values, store = StorageClass())
+    for v in values[::5]: pq.remove(v)
+    store = StorageClass()
+    counts = stats.instrument(store)
+    pq2 = dump_and_load(pq, store = store)
+    assert counts.total_comparisons() == 0
+    assert [pq2.pop() for i in xrange(len(pq2))] == sorted(set(values) - set(values[::5]))
+
+def test_dump_load_lazy_removal():
+    pq = PQ(range(20), store = binheap.Storage(lazy_removal_ratio = 0.5), key = abs)
+    for v in [0, 3, 7]: pq.remove(v)
+    pq2 = dump_and_load(pq, store = binheap.Storage(lazy_removal_ratio = 0.5), key = abs)
+    assert [pq2.pop() for i in xrange(len(pq2))] == sorted(set(range(20)) - set([0, 3, 7]))
+
+def test_dump_load_other_storage():
+    # A layout that is not understood by the storage is heapified
+    pq = PQ(range(50, 0, -1), store = daryheap.Storage(arity = 3))
+    pq2 = dump_and_load(pq, store = pairingheap.Storage())
+    assert [pq2.pop() for i in xrange(50)] == range(1, 51)
+    pq2 = dump_and_load(pq, store = daryheap.Storage(arity = 4))
+    assert [pq2.pop() for i in xrange(50)] == range(1, 51)
+    with pytest.raises(ValueError):
+        PQ.load(StringIO(cPickle.dumps("junk")))
+
+def test_load_key_mismatch():
+    priorities = dict((v, -v) for v in xrange(10))
+    keyed = PQ(range(10), key = priorities.__getitem__)
+    with pytest.raises(ValueError):
+        dump_and_load(keyed)
+    with pytest.raises(ValueError):
+        dump_and_load(PQ(range(10)), key = priorities.__getitem__)
+    assert dump_and_load(keyed, key = priorities.__getitem__).pop() == 9
+
+def test_dump_load_duplicates():
+    pq = PQ([3, 1, 3, 2, 1, 3], duplicates = True, maxsize = 5)
+    pq2 = dump_and_load(pq)
+    assert pq2.duplicates and pq2.maxsize == 5
+    assert len(pq2.handlesByValue[3]) == 2 and len(pq2.handlesByValue[1]) == 2
+    assert [h.value for h in pq2.handlesByValue[3]] == [3, 3]
+    # The maxsize is enforced after loading
+    pq2.push_many([0, 0, 5])
+    assert [pq2.pop() for i in xrange(len(pq2))] == [0, 0, 1, 1, 2]
+
+@pytest.mark.parametrize("StorageClass", keyed_storage_classes + [radixheap.Storage])
+@pytest.mark.parametrize("batch", [3, 200])
+def test_batches(StorageClass, batch):
+    import random
+    rnd = random.Random(batch)
+    priorities = dict((v, rnd.randint(0, 10000)) for v in xrange(600))
+    pq = PQ(range(600), store = StorageClass(), key = priorities.__getitem__)
+    popped = pq.pop_many(batch)
+    assert popped == sorted(popped, key = priorities.__getitem__)
+    expected = set(xrange(600)) - set(popped)
+    floor = priorities[popped[-1]]
+
+    removed = rnd.sample(sorted(expected), batch)
+    pq.remove_many(removed + [removed[0], -1])
+    expected -= set(removed)
+    adjusted = rnd.sample(sorted(expected), batch)
+    for v in adjusted:
+        priorities[v] = rnd.randint(floor, 10000)
+    priorities[-2] = floor
+    handles = pq.adjust_many([pq.find(v) for v in adjusted] + [-2])
+    assert len(handles) == batch + 1 and handles[-1].value == -2
+    expected.add(-2)
+    assert len(pq) == len(expected)
+
+    popped = pq.pop_many(len(pq) / 2) + pq.pop_many(1000)
+    assert not pq and pq.pop_many(5) == []
+    assert sorted(popped) == sorted(expected)
+    assert [priorities[v] for v in popped] == sorted(priorities[v] for v in popped)
+
+def test_batches_lazy_removal():
+    pq = PQ(range(100), store = binheap.Storage(lazy_removal_ratio = 0.5), key = abs)
+    pq.remove_many(range(0, 100, 4))
+    pq.remove(1)
+    assert pq.pop_many(3) == [2, 3, 5]
+    assert pq.pop_many(100) == [v for v in xrange(6, 100) if v % 4]
+
+def test_batches_maxsize_duplicates():
+    pq = PQ([5, 1, 5, 3, 1], duplicates = True, maxsize = 4)
+    assert pq.pop_many(1) == [1]
+    pq.remove_many([5])
+    assert len(pq) == 2 and not pq.handlesByValue.get(5)
+    pq.push_many([7, 6, 2, 4, 3])
+    # Only the instance referred by a handle is removed
+    pq.remove_many([pq.find(3)])
+    assert pq.pop_many(5) == [1, 2, 3]
+
+@pytest.mark.parametrize("arity", [2, 3, 8])
+def test_dary_arity(arity):
+    values = [(i * 37) % 101 for i in xrange(101)]
+    pq = PQ(values[:50], store = daryheap.Storage(arity = arity))
+    for v in values[50:]: pq.push(v)
+    for v in values[::3]: pq.remove(v)
+    remaining = sorted(set(values) - set(values[::3]))
+    assert [pq.pop() for i in xrange(len(pq))] == remaining
+
+def test_dary_invalid_arity():
+    with pytest.raises(ValueError):
+        daryheap.Storage(arity = 1)
+
+def test_radix_monotone():
+    priorities = {"a": 5, "b": 2, "c": 10, "d": 7}
+    pq = PQ(priorities.keys(), store = radixheap.Storage(), key = priorities.__getitem__)
+    assert pq.pop() == "b"
+    priorities["c"] = 3
+    pq.adjust("c")
+    assert pq.top.value == "c"
+    pq.remove("a")
+    priorities["e"] = 3
+    pq.push("e")
+    assert sorted([pq.pop(), pq.pop()]) == ["c", "e"]
+    assert pq.pop() == "d"
+    assert not pq
+
+def test_radix_violation():
+    pq = PQ([5, 3, 8], store = radixheap.Storage())
+    assert pq.pop() == 3
+    with pytest.raises(ValueError):
+        pq.push(2)
+    with pytest.raises(ValueError):
+        PQ(store = radixheap.Storage(), comparator = lambda x,y: cmp(y,x))
+
+def test_radix_rejected_adjust():
+    priorities = {"a": 1, "b": 2, "c": 3}
+    pq = PQ("abc", store = radixheap.Storage(), key = priorities.__getitem__)
+    assert pq.pop() == "a"
+    priorities["c"] = 0
+    with pytest.raises(ValueError):
+        pq.adjust("c")
+    # The value keeps its old key and can still be popped
+    assert len(pq) == 2 and pq.find("c").key == 3
+    assert [pq.pop(), pq.pop()] == ["b", "c"]
+    assert not pq
+
+@pytest.mark.parametrize("slot_bits", [1, 3, 6])
+def test_timerwheel(slot_bits):
+    import random
+    rnd = random.Random(slot_bits)
+    # Deadlines in milliseconds most of which are cancelled before they fire
+    now = 1500000000000
+    deadlines = {}
+    pq = PQ(store = timerwheel.Storage(start = now, slot_bits = slot_bits), key = deadlines.__getitem__)
+    fired = []
+    for timer in xrange(2000):
+        deadlines[timer] = now + rnd.randint(0, 100000)
+        pq.push(timer)
+        if rnd.random() < 0.7:
+            pq.remove(timer)
+        elif rnd.random() < 0.2:
+            deadlines[timer] += rnd.randint(-5, 1000)
+            pq.adjust(timer)
+        if pq and rnd.random() < 0.3:
+            assert pq.top.value == min(pq.handlesByValue, key = deadlines.__getitem__)
+            fired.append(pq.pop())
+            now = deadlines[fired[-1]]
+    while pq:
+        fired.append(pq.pop())
+    assert [deadlines[t] for t in fired] == sorted(deadlines[t] for t in fired)
+
+def test_timerwheel_violation():
+    pq = PQ([70, 3, 8], store = timerwheel.Storage())
+    assert pq.pop() == 3
+    with pytest.raises(ValueError):
+        pq.push(2)
+    assert [pq.pop(), pq.pop()] == [8, 70]
+    with pytest.raises(ValueError):
+        PQ(store = timerwheel.Storage(), comparator = lambda x,y: cmp(y,x))
+
+def test_external(tmpdir):
+    import random
+    rnd = random.Random(0)
+    directory = str(tmpdir)
+    priorities = dict((v, rnd.randint(0, 1000)) for v in xrange(500))
+    store = external.Storage(buffer_size = 16, max_runs = 4, directory = directory)
+    pq = PQ(store = store, key = priorities.__getitem__)
+    for v in xrange(500):
+        pq.push(v)
+    assert store.numruns > 0 and len(store._memory) <= 16
+    assert len(os.listdir(directory)) == store.numruns
+
+    # Spilled values can be removed and adjusted
+    for v in xrange(0, 500, 7):
+        pq.remove(v)
+    for v in xrange(1, 500, 11):
+        if v % 7 == 0: continue
+        priorities[v] = rnd.randint(0, 1000)
+        pq.adjust(v)
+    handles = dict((v, pq.find(v)) for v in xrange(1, 500, 13) if v % 7)
+    assert any(h.spilled for h in handles.values())
+    popped = []
+    while pq:
+        # Handles of spilled values are preserved when they are read back
+        handle = store.top()
+        assert handles.get(handle.value, handle) is handle
+        popped.append(pq.pop())
+    assert sorted(popped) == [v for v in xrange(500) if v % 7]
+    assert [priorities[v] for v in popped] == sorted(priorities[v] for v in popped)
+    assert store.numruns == 0 and os.listdir(directory) == []
+
+def test_external_close():
+    store = external.Storage(buffer_size = 4)
+    pq = PQ(range(20), store = store)
+    directory = store._files.directory
+    assert directory is not None and store.numruns > 0
+    assert [pq.pop() for i in xrange(3)] == [0, 1, 2]
+    store.close()
+    assert not store and not os.path.exists(directory)
+
+    # Run files are deleted at the end of a with block or when a storage is collected
+    with external.Storage(buffer_size = 4) as store:
+        store.heapify(range(20))
+        directory = store._files.directory
+        assert os.listdir(directory)
+    assert not os.path.exists(directory)
+    store = external.Storage(buffer_size = 4)
+    store.heapify(range(20))
+    directory = store._files.directory
+    del store
+    assert not os.path.exists(directory)
+
+class Job(object):
+    """ A picklable value whose live instances are counted with weak references. """
+    def __init__(self, priority):
+        self.priority = priority
+
+def test_external_bounded_memory():
+    import random
+    import weakref
+    rnd = random.Random(0)
+    live = weakref.WeakSet()
+    # Used directly (without a PQ) only the values in memory are kept alive
+    with external.Storage(keyfunc = lambda job: job.priority, buffer_size = 50, max_runs = 4) as store:
+        for i in xrange(2000):
+            job = Job(rnd.randint(0, 10 ** 6))
+            live.add(job)
+            store.push(job)
+        del job
+        assert len(store) == 2000 and len(live) <= 50
+        priorities = []
+        while store:
+            priorities.append(store.pop().value.priority)
+            assert len(live) <= 51
+        assert priorities == sorted(priorities) and len(priorities) == 2000
+
+def test_lazy_removal():
+    values = range(20)
+    store = binheap.Storage(lazy_removal_ratio = 0.5)
+    pq = PQ(values, store = store, key = abs)
+    for v in [0, 1, 5, 7]:
+        pq.remove(v)
+    # Removed values stay in the heap but are skipped
+    assert len(pq) == 16
+    assert len([h for h in store._handles if h]) == 20
+    assert pq.top.value == 2
+    assert pq.pop() == 2
+
+    # Removing more than half of them compacts the heap
+    for v in range(8, 19):
+        pq.remove(v)
+    assert len(pq) == 4
+    assert len([h for h in store._handles if h]) < 10
+    assert [pq.pop() for i in xrange(4)] == [3, 4, 6, 19]
+    assert not pq
+
+def test_lazy_removal_mutated_values():
+    # Without a key function the values are the keys so a removed value that is then
+    # modified must not be left in the heap
+    store = binheap.Storage(lazy_removal_ratio = 0.5)
+    pq = PQ(store = store, comparator = lambda x,y: cmp(x.value, y.value))
+    handles = [pq.push(Value(v)) for v in xrange(20)]
+    for handle in handles[:8:3]:
+        pq.remove(handle)
+        handle.value.value = 100
+    assert len([h for h in store._handles if h]) == 17
+    assert [pq.pop().value for i in xrange(17)] == [v for v in xrange(20) if v not in (0, 3, 6)]
+
+def test_compact_layout():
+    store = compactheap.Storage()
+    pq = PQ(range(20), store = store)
+    for v in [0, 5, 7, 19, 12]:
+        pq.remove(v)
+    # No holes are left behind
+    assert len(store._handles) == 15
+    assert all(h.index == i for i,h in enumerate(store._handles))
+    assert [pq.pop() for i in xrange(15)] == [1,2,3,4,6,8,9,10,11,13,14,15,16,17,18]
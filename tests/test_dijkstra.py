@@ -0,0 +1,69 @@
+import pytest
+import random
+from priorityq.algorithms.dijkstra import INFINITY
+from priorityq.algorithms.dijkstra import shortest_path, shortest_path_csr, bidirectional_shortest_path
+from priorityq.algorithms.graph import CSRGraph
+from priorityq.storage import binheap
+from priorityq.storage import radixheap
+
+edges = [
+    (1, 2, 7), (1, 3, 9), (1, 6, 14),
+    (2, 3, 10), (2, 4, 15),
+    (3, 4, 11), (3, 6, 2),
+    (4, 5, 6),
+    (6, 5, 9),
+    (5, 1, 3)
+]
+
+def neighbours(node):
+    return [(t, w) for s,t,w in edges if s == node]
+
+def test_shortest_path():
+    distances, parents = shortest_path(1, 5, neighbours, binheap.Storage)
+    assert distances[5] == 20
+    assert parents[5] == 6 and parents[6] == 3 and parents[3] == 1
+
+def test_csr_graph():
+    graph = CSRGraph.from_edges(7, edges)
+    assert graph.numnodes == 7
+    assert graph.numedges == len(edges)
+    for node in xrange(7):
+        assert sorted(graph.neighbours(node)) == sorted(neighbours(node))
+
+@pytest.mark.parametrize("storage_class", [None, binheap.Storage, radixheap.Storage])
+def test_shortest_path_csr(storage_class):
+    graph = CSRGraph.from_edges(7, edges)
+    distances, parents = shortest_path_csr(1, 5, graph, storage_class)
+    assert distances[5] == 20
+    assert list(parents[:7]) == [-1, -1, 1, 1, 3, 6, 3]
+
+def reverse_neighbours(node):
+    return [(s, w) for s,t,w in edges if t == node]
+
+def test_bidirectional_shortest_path():
+    assert bidirectional_shortest_path(1, 5, neighbours, reverse_neighbours) == (20, [1, 3, 6, 5])
+    assert bidirectional_shortest_path(5, 4, neighbours, reverse_neighbours) == (23, [5, 1, 3, 4])
+    assert bidirectional_shortest_path(2, 2, neighbours, reverse_neighbours) == (0, [2])
+    assert bidirectional_shortest_path(1, 7, neighbours, reverse_neighbours) == (INFINITY, [])
+
+@pytest.mark.parametrize("seed", range(5))
+def test_bidirectional_matches_shortest_path(seed):
+    rnd = random.Random(seed)
+    graph = {}
+    for i in xrange(200):
+        graph.setdefault(rnd.randint(0, 40), {})[rnd.randint(0, 40)] = rnd.randint(0, 20)
+    reverse = {}
+    for s in graph:
+        for t,w in graph[s].iteritems():
+            reverse.setdefault(t, {})[s] = w
+    forward_func = lambda n: graph.get(n, {}).iteritems()
+    reverse_func = lambda n: reverse.get(n, {}).iteritems()
+    for i in xrange(20):
+        source, target = rnd.randint(0, 40), rnd.randint(0, 40)
+        if source == target: continue
+        distances, parents = shortest_path(source, target, forward_func)
+        dist, path = bidirectional_shortest_path(source, target, forward_func, reverse_func)
+        assert dist == distances.get(target, INFINITY)
+        if path:
+            assert path[0] == source and path[-1] == target
+            assert sum(graph[a][b] for a,b in zip(path, path[1:])) == dist
@@ -0,0 +1,84 @@
+import os
+import gzip
+import struct
+import pytest
+from priorityq.algorithms import dimacs
+from priorityq.algorithms import graph as graph_module
+from priorityq.algorithms.graph import CSRGraph
+
+contents = """c A small graph
+p sp 6 10
+a 1 2 7
+a 1 3 9
+a 1 6 14
+a 2 3 10
+a 2 4 15
+a 3 4 11
+a 3 6 2
+a 4 5 6
+a 6 5 9
+a 5 1 3
+"""
+
+def edges_of(graph):
+    return sorted((node, t, w) for node in xrange(graph.numnodes) for t,w in graph.neighbours(node))
+
+expected_edges = sorted(tuple(int(x) for x in line.split()[1:]) for line in contents.split("\n") if line.startswith("a"))
+
+@pytest.mark.parametrize("filename", ["small.gr", "small.gr.gz"])
+def test_read_graph(tmpdir, filename):
+    path = str(tmpdir.join(filename))
+    outfile = gzip.GzipFile(path, "wb") if filename.endswith(".gz") else open(path, "wb")
+    outfile.write(contents)
+    outfile.close()
+    graph = dimacs.read_graph(path)
+    assert graph.numnodes == 7
+    assert edges_of(graph) == expected_edges
+
+def test_save_load(tmpdir):
+    path = str(tmpdir.join("small.csr"))
+    graph = CSRGraph.from_edges(7, expected_edges)
+    graph.save(path)
+    loaded = CSRGraph.load(path)
+    assert loaded.offsets == graph.offsets
+    assert loaded.targets == graph.targets
+    assert loaded.weights == graph.weights
+
+    tmpdir.join("bad.csr").write("not a graph" * 10)
+    with pytest.raises(ValueError):
+        CSRGraph.load(str(tmpdir.join("bad.csr")))
+
+    # Arrays written on a platform where the typecode has a different item size
+    data = open(path, "rb").read()
+    header = list(struct.unpack_from(graph_module.HEADER_FORMAT, data))
+    header[2] *= 2
+    tmpdir.join("wide.csr").write(struct.pack(graph_module.HEADER_FORMAT, *header) +
+                                  data[struct.calcsize(graph_module.HEADER_FORMAT):], "wb")
+    with pytest.raises(ValueError):
+        CSRGraph.load(str(tmpdir.join("wide.csr")))
+
+def test_load_graph_cache(tmpdir):
+    path = str(tmpdir.join("small.gr"))
+    tmpdir.join("small.gr").write(contents)
+    graph = dimacs.load_graph(path)
+    assert os.path.exists(path + ".csr")
+    assert edges_of(graph) == expected_edges
+
+    # The cache is used as long as it is newer than the graph
+    CSRGraph.from_edges(3, [(1, 2, 5)]).save(path + ".csr")
+    assert edges_of(dimacs.load_graph(path)) == [(1, 2, 5)]
+    os.utime(path + ".csr", (0, 0))
+    assert edges_of(dimacs.load_graph(path)) == expected_edges
+
+    # A cache that cannot be read is rewritten
+    tmpdir.join("small.gr.csr").write("not a graph")
+    assert edges_of(dimacs.load_graph(path)) == expected_edges
+    assert edges_of(CSRGraph.load(path + ".csr")) == expected_edges
+
+    # As is a truncated one
+    data = open(path + ".csr", "rb").read()
+    tmpdir.join("small.gr.csr").write(data[:-4], "wb")
+    with pytest.raises(ValueError):
+        CSRGraph.load(path + ".csr")
+    assert edges_of(dimacs.load_graph(path)) == expected_edges
+    assert open(path + ".csr", "rb").read() == data
@@ -0,0 +1,87 @@
+import pytest
+import random
+from priorityq import PQ
+from priorityq.storage import stats
+from priorityq.storage import binheap
+from priorityq.storage import daryheap
+from priorityq.storage import arrayheap
+from priorityq.storage import radixheap
+from priorityq.storage import pairingheap
+from priorityq.storage import binomialheap
+
+@pytest.mark.parametrize("storage_class", [binheap.Storage, daryheap.Storage, arrayheap.Storage,
+                                           radixheap.Storage, pairingheap.Storage, binomialheap.Storage])
+def test_instrumented_storage(storage_class):
+    values = range(100)
+    random.Random(0).shuffle(values)
+    pq = PQ(store = storage_class())
+    collector = stats.instrument(pq.storage)
+    assert pq.storage.stats is collector
+    assert isinstance(pq.storage, storage_class)
+    for value in values:
+        pq.push(value)
+    pq.remove(values[0])
+    assert [pq.pop() for i in xrange(99)] == sorted(values[1:])
+
+    assert collector.operations["push"] == 100
+    assert collector.operations["pop"] == 99
+    assert collector.operations["remove"] == 1
+    assert sum(collector.comparisons["push"].values()) == 100
+    if storage_class not in (arrayheap.Storage, radixheap.Storage):
+        assert collector.total_comparisons() > 0
+
+    assert stats.uninstrument(pq.storage) is collector
+    assert type(pq.storage) is storage_class
+    assert not hasattr(pq.storage, "stats")
+    pq.push(200)
+    assert collector.operations["push"] == 100
+
+def test_sift_lengths():
+    storage = binheap.Storage()
+    collector = stats.instrument(storage)
+    for value in xrange(15, 0, -1):
+        storage.push(value)
+    # Each push of a smaller value moves it to the root
+    assert collector.sift_lengths["push"] == {0: 1, 1: 2, 2: 4, 3: 8}
+    assert collector.total_swaps() == 2 + 8 + 24
+    storage.pop()
+    assert collector.sift_lengths["pop"] == {3: 1}
+    assert collector.released_indexes["pop"] == 1
+    collector.reset()
+    assert collector.as_dict() == {"operations": {}, "comparisons": {}, "sift_lengths": {}, "released_indexes": {}}
+
+def test_comparator_and_key_changes():
+    storage = radixheap.Storage()
+    collector = stats.instrument(storage)
+    assert storage.comparator is cmp
+    for value in [3, 1, 2]:
+        storage.push(value)
+    storage.key = lambda x: 10 - x
+    assert storage.pop().value == 3
+    with pytest.raises(ValueError):
+        storage.comparator = lambda x,y: cmp(y, x)
+
+    storage = daryheap.Storage()
+    collector = stats.instrument(storage)
+    storage.comparator = lambda x,y: cmp(y, x)
+    for value in [3, 1, 2]:
+        storage.push(value)
+    assert storage.pop().value == 3
+    assert collector.total_comparisons() > 0
+
+def test_batch_operations():
+    storage = binheap.Storage()
+    collector = stats.instrument(storage)
+    handles = storage.heapify(range(90))
+    collector.reset()
+    storage.remove_many(handles[::2][:40])
+    assert collector.operations == {"remove_many": 1}
+    assert collector.total_comparisons() > 0
+    assert None not in collector.released_indexes
+    storage.adjust_many(handles[1:11:2])
+    storage.pop_many(30)
+    handles, layout = storage.snapshot()
+    values = [h.value for h in handles]
+    storage.restore(values, values, layout)
+    assert collector.operations == {"remove_many": 1, "adjust_many": 1, "pop_many": 1,
+                                    "snapshot": 1, "restore": 1}